@@ -10,12 +10,11 @@ Date: 2025-09-17
 
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
-import json
 import sqlite3
+from collections import Counter
+from dataclasses import replace
 from datetime import datetime
+from html import escape
 from typing import Dict, List, Optional, Tuple
 from database import DatabaseManager, Competency, Course, User, Assessment, CourseIntention
 
@@ -28,8 +27,110 @@ st.set_page_config(
 )
 
 # Initialize database
-db = DatabaseManager()
-db.seed_initial_data()
+@st.cache_resource
+def get_db():
+    """Create and seed the database manager once per process"""
+    manager = DatabaseManager()
+    manager.seed_initial_data()
+    return manager
+
+db = get_db()
+
+# Cached catalog lookups (competencies and courses change only through admin)
+@st.cache_data(ttl=300)
+def cached_competencies(level: Optional[str] = None) -> List[Competency]:
+    """Competencies for a level, cached across reruns"""
+    return db.get_competencies(level=level)
+
+@st.cache_data(ttl=300)
+def cached_courses() -> List[Course]:
+    """Active courses, cached across reruns"""
+    return db.get_courses()
+
+@st.cache_data(ttl=300)
+def cached_courses_with_competencies() -> List[Tuple[Course, List[Competency]]]:
+    """Active courses paired with their linked competencies, cached across reruns"""
+    return db.get_courses_with_competencies()
+
+@st.cache_data(ttl=300)
+def competency_index() -> Dict[int, Competency]:
+    """All competencies keyed by id, built with a single query"""
+    return {c.id: c for c in db.get_competencies()}
+
+def build_competency_view(competencies: List[Competency], assessments: Dict[int, Assessment]) -> Dict:
+    """Derive per-competency status and the gap set from a user's assessments"""
+    competency_status = []
+    for comp in competencies:
+        assessment = assessments.get(comp.id)
+        if assessment:
+            if assessment.score >= 4:
+                status = "Dominada"
+                status_class = "competency-mastered"
+                icon = "✅"
+            elif assessment.score >= 2:
+                status = "Em desenvolvimento"
+                status_class = "competency-developing"
+                icon = "🟡"
+            else:
+                status = "Necessária"
+                status_class = "competency-needed"
+                icon = "🔴"
+        else:
+            status = "Necessária"
+            status_class = "competency-needed"
+            icon = "🔴"
+        
+        competency_status.append({
+            'competency': comp,
+            'status': status,
+            'status_class': status_class,
+            'icon': icon,
+            'score': assessment.score if assessment else 0
+        })
+    
+    return {
+        'competencies': competencies,
+        'assessments': assessments,
+        'status': competency_status,
+        'gaps': {c['competency'].id for c in competency_status if c['score'] < 4}
+    }
+
+@st.cache_data(max_entries=1000)
+def user_competency_view(user_id: int, target_level: str, version: int) -> Dict:
+    """Competency status for a user's target level, rebuilt when ``version`` changes"""
+    assessments = db.get_user_assessments(user_id)
+    competencies = db.get_competencies(level=target_level)
+    return build_competency_view(competencies, assessments)
+
+def current_competency_view(user: User) -> Dict:
+    """Cached competency view for the logged-in user"""
+    return user_competency_view(user.id, user.target_level, db.assessments_version)
+
+def admin_cached(key: str, version: int, loader):
+    """Keep admin data in session state until the matching db version moves"""
+    admin_cache = st.session_state.setdefault('admin_cache', {})
+    entry = admin_cache.get(key)
+    if entry is None or entry[0] != version:
+        entry = admin_cache[key] = (version, loader())
+    return entry[1]
+
+def clear_catalog_cache():
+    """Invalidate cached catalog lookups after an admin change"""
+    cached_competencies.clear()
+    cached_courses.clear()
+    cached_courses_with_competencies.clear()
+    competency_index.clear()
+    user_competency_view.clear()
+    clear_report_cache()
+
+def clear_report_cache():
+    """Invalidate cached admin statistics and report data"""
+    admin_stats.clear()
+    cached_users.clear()
+    cached_summary_counts.clear()
+    cached_competency_analysis.clear()
+    cached_course_demand.clear()
+    cached_trends.clear()
 
 # Session state initialization
 if 'current_user' not in st.session_state:
@@ -41,43 +142,18 @@ if 'assessment_progress' not in st.session_state:
 if 'form_counter' not in st.session_state:
     st.session_state.form_counter = 0
 
-# Custom CSS
-st.markdown("""
-<style>
-    .main-header {
-        background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
-        padding: 1rem;
-        border-radius: 0.5rem;
-        margin-bottom: 1rem;
-        color: white;
-    }
-    .competency-card {
-        background: #f8f9fa;
-        padding: 1rem;
-        border-radius: 0.5rem;
-        margin-bottom: 0.5rem;
-        border-left: 4px solid #007bff;
-    }
-    .competency-mastered {
-        border-left-color: #28a745;
-        background: #d4edda;
-    }
-    .competency-developing {
-        border-left-color: #ffc107;
-        background: #fff3cd;
-    }
-    .competency-needed {
-        border-left-color: #dc3545;
-        background: #f8d7da;
-    }
-    .metric-card {
-        background: white;
-        padding: 1rem;
-        border-radius: 0.5rem;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-    }
-</style>
-""", unsafe_allow_html=True)
+# Custom CSS (kept compact: it is re-sent on every rerun, since Streamlit
+# drops any element a run does not emit again)
+CUSTOM_CSS = """<style>
+.main-header{background:linear-gradient(90deg,#667eea 0%,#764ba2 100%);padding:1rem;border-radius:.5rem;margin-bottom:1rem;color:white}
+.competency-card{background:#f8f9fa;padding:1rem;border-radius:.5rem;margin-bottom:.5rem;border-left:4px solid #007bff}
+.competency-mastered{border-left-color:#28a745;background:#d4edda}
+.competency-developing{border-left-color:#ffc107;background:#fff3cd}
+.competency-needed{border-left-color:#dc3545;background:#f8d7da}
+.metric-card{background:white;padding:1rem;border-radius:.5rem;box-shadow:0 2px 4px rgba(0,0,0,0.1)}
+</style>"""
+
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
 def login_page():
     """User login page"""
@@ -97,6 +173,7 @@ def login_page():
                 if not user:
                     user_id = db.create_user(name, email, current_level, target_level)
                     user = db.get_user_by_email(email)
+                    clear_report_cache()
                 
                 st.session_state.current_user = user
                 st.success(f"Bem-vindo, {user.name}!")
@@ -112,46 +189,14 @@ def competency_matrix_dashboard():
     
     st.markdown(f'<div class="main-header"><h1>📊 Matriz de Competências</h1><p>{user.name} - {user.current_level} → {user.target_level}</p></div>', unsafe_allow_html=True)
     
-    # Get user assessments
-    assessments = db.get_user_assessments(user.id)
-    
-    # Get competencies for target level
-    target_competencies = db.get_competencies(level=user.target_level)
-    
-    # Calculate competency status
-    competency_status = []
-    for comp in target_competencies:
-        assessment = assessments.get(comp.id)
-        if assessment:
-            if assessment.score >= 4:
-                status = "Dominada"
-                status_class = "competency-mastered"
-                icon = "✅"
-            elif assessment.score >= 2:
-                status = "Em desenvolvimento"
-                status_class = "competency-developing"
-                icon = "🟡"
-            else:
-                status = "Necessária"
-                status_class = "competency-needed"
-                icon = "🔴"
-        else:
-            status = "Necessária"
-            status_class = "competency-needed"
-            icon = "🔴"
-        
-        competency_status.append({
-            'competency': comp,
-            'status': status,
-            'status_class': status_class,
-            'icon': icon,
-            'score': assessment.score if assessment else 0
-        })
+    # Competency status for the target level
+    competency_status = current_competency_view(user)['status']
     
     # Metrics summary
-    mastered = sum(1 for c in competency_status if c['status'] == 'Dominada')
-    developing = sum(1 for c in competency_status if c['status'] == 'Em desenvolvimento')
-    needed = sum(1 for c in competency_status if c['status'] == 'Necessária')
+    status_counts = Counter(c['status'] for c in competency_status)
+    mastered = status_counts['Dominada']
+    developing = status_counts['Em desenvolvimento']
+    needed = status_counts['Necessária']
     
     col1, col2, col3, col4 = st.columns(4)
     with col1:
@@ -167,32 +212,40 @@ def competency_matrix_dashboard():
     # Competency matrix visualization
     st.subheader("Matriz de Competências")
     
-    # Group by category
-    categories = {}
-    for comp_status in competency_status:
-        category = comp_status['competency'].category
-        if category not in categories:
-            categories[category] = []
-        categories[category].append(comp_status)
-    
-    for category, comp_list in categories.items():
-        category_names = {
-            'technical': '🔧 Técnicas',
-            'behavioral': '👥 Comportamentais', 
-            'strategic': '🎯 Estratégicas'
-        }
-        
-        st.markdown(f"### {category_names.get(category, category)}")
+    # Group by category, rendering each category's cards in a single markdown call
+    category_names = {
+        'technical': '🔧 Técnicas',
+        'behavioral': '👥 Comportamentais', 
+        'strategic': '🎯 Estratégicas'
+    }
+    
+    if competency_status:
+        status_df = pd.DataFrame([
+            {
+                'category': c['competency'].category,
+                'name': c['competency'].name,
+                'description': c['competency'].description,
+                'level': c['competency'].level,
+                'weight': c['competency'].weight,
+                'status_class': c['status_class'],
+                'icon': c['icon'],
+                'score': c['score']
+            }
+            for c in competency_status
+        ])
         
-        for comp_status in comp_list:
-            comp = comp_status['competency']
-            st.markdown(f'''
-                <div class="competency-card {comp_status['status_class']}">
-                    <h4>{comp_status['icon']} {comp.name}</h4>
-                    <p>{comp.description}</p>
-                    <small><strong>Nível:</strong> {comp.level} | <strong>Peso:</strong> {comp.weight} | <strong>Score:</strong> {comp_status['score']}/5</small>
-                </div>
-            ''', unsafe_allow_html=True)
+        for category, group in status_df.groupby('category', sort=False):
+            st.markdown(f"### {category_names.get(category, category)}")
+            
+            cards = [
+                f'<div class="competency-card {row["status_class"]}">'
+                f'<h4>{row["icon"]} {row["name"]}</h4>'
+                f'<p>{row["description"]}</p>'
+                f'<small><strong>Nível:</strong> {row["level"]} | <strong>Peso:</strong> {row["weight"]} | <strong>Score:</strong> {row["score"]}/5</small>'
+                f'</div>'
+                for row in group.to_dict('records')
+            ]
+            st.markdown("\n".join(cards), unsafe_allow_html=True)
     
     # Career progression visualization
     st.subheader("Caminho de Carreira")
@@ -201,45 +254,13 @@ def competency_matrix_dashboard():
     current_index = levels.index(user.current_level)
     target_index = levels.index(user.target_level)
     
-    fig = go.Figure()
-    
-    # Add progression path
-    fig.add_trace(go.Scatter(
-        x=levels,
-        y=[1, 1, 1, 1],
-        mode='lines+markers',
-        line=dict(color='lightgray', width=4),
-        marker=dict(size=20, color='lightgray'),
-        name='Caminho de Carreira'
-    ))
-    
-    # Highlight current position
-    fig.add_trace(go.Scatter(
-        x=[levels[current_index]],
-        y=[1],
-        mode='markers',
-        marker=dict(size=25, color='blue'),
-        name=f'Atual: {user.current_level}'
-    ))
-    
-    # Highlight target position
-    fig.add_trace(go.Scatter(
-        x=[levels[target_index]],
-        y=[1],
-        mode='markers',
-        marker=dict(size=25, color='red'),
-        name=f'Alvo: {user.target_level}'
+    st.markdown(" → ".join(
+        f"**🔵 {level}**" if i == current_index
+        else f"**🔴 {level}**" if i == target_index
+        else level
+        for i, level in enumerate(levels)
     ))
-    
-    fig.update_layout(
-        title="Progressão na Carreira",
-        xaxis_title="Nível Hierárquico",
-        yaxis=dict(showticklabels=False),
-        showlegend=True,
-        height=200
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"🔵 Atual: {user.current_level} | 🔴 Alvo: {user.target_level}")
 
 def self_assessment_page():
     """Self-assessment questionnaire page"""
@@ -250,8 +271,9 @@ def self_assessment_page():
     st.markdown(f'<div class="main-header"><h1>📝 Autoavaliação de Competências</h1><p>Avalie suas competências atuais</p></div>', unsafe_allow_html=True)
     
     # Get competencies for target level
-    target_competencies = db.get_competencies(level=user.target_level)
-    current_assessments = db.get_user_assessments(user.id)
+    view = current_competency_view(user)
+    target_competencies = view['competencies']
+    current_assessments = view['assessments']
     
     if not target_competencies:
         st.info("Nenhuma competência encontrada para o nível almejado.")
@@ -292,8 +314,7 @@ def self_assessment_page():
         
         if st.form_submit_button("Salvar Avaliação"):
             # Save all assessments
-            for comp_id, score in assessments_data.items():
-                db.save_assessment(user.id, comp_id, score)
+            db.save_assessments_bulk(user.id, list(assessments_data.items()))
             
             st.success("Autoavaliação salva com sucesso!")
             st.balloons()
@@ -307,26 +328,19 @@ def course_registration_page():
     
     st.markdown(f'<div class="main-header"><h1>📚 Registro de Intenção de Cursos</h1><p>Selecione cursos para seu desenvolvimento</p></div>', unsafe_allow_html=True)
     
-    # Get user assessments to identify gaps
-    assessments = db.get_user_assessments(user.id)
-    
     # Get all courses
-    courses = db.get_courses()
+    courses = cached_courses()
+    courses_by_id = {c.id: c for c in courses}
     
     # Get user's current intentions
     current_intentions = db.get_user_intentions(user.id)
     intended_course_ids = {intention.course_id for intention in current_intentions}
     
     # Identify competency gaps
-    target_competencies = db.get_competencies(level=user.target_level)
-    gap_competencies = []
-    
-    for comp in target_competencies:
-        assessment = assessments.get(comp.id)
-        if not assessment or assessment.score < 4:
-            gap_competencies.append(comp.id)
+    gap_competencies = current_competency_view(user)['gaps']
     
     # Enhanced filtering and search
+    categories_sorted = sorted({course.category for course in courses})
     col1, col2 = st.columns([2, 1])
     
     with col1:
@@ -335,49 +349,22 @@ def course_registration_page():
     with col2:
         category_filter = st.selectbox(
             "Filtrar por categoria",
-            ["Todas"] + list(set(course.category for course in courses))
+            ["Todas"] + categories_sorted
         )
     
-    # Get all categories for filter
-    all_categories = list(set(course.category for course in courses))
-    
-    # Filter courses based on search and category
-    filtered_courses = []
-    for course in courses:
-        # Apply search filter
-        if search_term:
-            search_lower = search_term.lower()
-            if (search_lower not in course.name.lower() and 
-                search_lower not in course.description.lower() and
-                search_lower not in course.category.lower()):
-                continue
-        
-        # Apply category filter
-        if category_filter != "Todas" and course.category != category_filter:
-            continue
-        
-        # Calculate relevance score
-        relevance_score = sum(1 for comp_id in course.competency_ids if comp_id in gap_competencies)
-        
-        filtered_courses.append({
-            'course': course,
-            'relevance': relevance_score,
-            'already_intended': course.id in intended_course_ids,
-            'match_score': calculate_match_score(course, search_term) if search_term else 0
-        })
-    
-    # Sort by relevance and match score
-    filtered_courses.sort(key=lambda x: (x['relevance'], x['match_score']), reverse=True)
+    # Search, ranking and pagination run in SQL; only the rows shown are loaded
+    category = None if category_filter == "Todas" else category_filter
     
     # Show tabs for different views
     tab1, tab2 = st.tabs(["🎯 Recomendados", "📖 Todos os Cursos"])
     
     with tab1:
         # Show only courses with relevance > 0
-        recommended_courses = [c for c in filtered_courses if c['relevance'] > 0]
+        rows, n_recommended = db.search_courses(search_term, category, gap_competencies, only_relevant=True)
+        recommended_courses = build_course_data(rows, intended_course_ids)
         
-        if recommended_courses:
-            st.subheader(f"Cursos Recomendados para {user.target_level} ({len(recommended_courses)})")
+        if n_recommended:
+            st.subheader(f"Cursos Recomendados para {user.target_level} ({n_recommended})")
             
             for course_data in recommended_courses:
                 display_course_card(course_data, user, db, context="recommended")
@@ -385,22 +372,61 @@ def course_registration_page():
             st.info("Não há cursos recomendados com base nas suas lacunas atuais.")
     
     with tab2:
-        st.subheader(f"Todos os Cursos ({len(filtered_courses)})")
+        # Pagination (the page widget keeps its value in session state, so the
+        # requested page is known before the query runs)
+        items_per_page = 6
+        page = st.session_state.get('courses_page', 1)
+        rows, n_filtered = db.search_courses(
+            search_term, category, gap_competencies,
+            limit=items_per_page, offset=(page - 1) * items_per_page
+        )
+        if not rows and page > 1:
+            # The filters changed while a later page was selected
+            page = st.session_state.courses_page = 1
+            rows, n_filtered = db.search_courses(search_term, category, gap_competencies, limit=items_per_page)
+        max_page = max(1, (n_filtered + items_per_page - 1) // items_per_page)
         
-        if filtered_courses:
-            # Pagination
-            items_per_page = 6
-            page = st.number_input("Página", min_value=1, max_value=max(1, len(filtered_courses) // items_per_page + 1), value=1)
+        st.subheader(f"Todos os Cursos ({n_filtered})")
+        
+        if n_filtered:
+            st.number_input("Página", min_value=1, max_value=max_page, key="courses_page")
             
             start_idx = (page - 1) * items_per_page
-            end_idx = start_idx + items_per_page
-            page_courses = filtered_courses[start_idx:end_idx]
+            end_idx = min(start_idx + items_per_page, n_filtered)
+            page_courses = build_course_data(rows, intended_course_ids)
+            
+            # Course details as one HTML table instead of one expander per course
+            st.markdown(build_courses_html(page_courses), unsafe_allow_html=True)
             
-            for course_data in page_courses:
-                display_course_card(course_data, user, db, context="all")
+            # Development impact of this page's courses in a single chart
+            # (relevance is the number of gap competencies a course addresses)
+            impact_courses = [c for c in page_courses if c['relevance'] > 0]
+            if impact_courses:
+                import plotly.express as px
+                fig = px.bar(
+                    x=[c['course'].name for c in impact_courses],
+                    y=[c['relevance'] for c in impact_courses],
+                    labels={'x': 'Curso', 'y': 'Competências Atendidas'},
+                    title="Impacto no seu desenvolvimento"
+                )
+                fig.update_layout(height=300, showlegend=False)
+                st.plotly_chart(fig, use_container_width=True, key="plotly_chart_all_impact")
             
             # Pagination info
-            st.caption(f"Mostrando {start_idx + 1}-{min(end_idx, len(filtered_courses))} de {len(filtered_courses)} cursos")
+            st.caption(f"Mostrando {start_idx + 1}-{end_idx} de {n_filtered} cursos")
+            
+            # Only the selected course gets a registration form
+            page_by_id = {c['course'].id: c for c in page_courses}
+            selected_id = st.selectbox(
+                "Curso para registrar interesse",
+                list(page_by_id),
+                format_func=lambda cid: page_by_id[cid]['course'].name,
+                key="course_to_register"
+            )
+            if page_by_id[selected_id]['already_intended']:
+                st.success("✅ Interesse Registrado")
+            else:
+                course_intention_form(page_by_id[selected_id]['course'], user, db, context="all")
         else:
             st.info("Nenhum curso encontrado com os filtros atuais.")
     
@@ -408,10 +434,9 @@ def course_registration_page():
     if current_intentions:
         st.subheader("📋 Meus Interesses Registrados")
         
-        # Allow status updates
         intentions_df = []
         for intention in current_intentions:
-            course = next((c for c in courses if c.id == intention.course_id), None)
+            course = courses_by_id.get(intention.course_id)
             if course:
                 intentions_df.append({
                     'ID': intention.id,
@@ -425,37 +450,16 @@ def course_registration_page():
         if intentions_df:
             df = pd.DataFrame(intentions_df)
             
-            # Allow inline status updates
-            edited_df = st.data_editor(
-                df.drop('ID', axis=1),
-                column_config={
-                    "Status": st.column_config.SelectboxColumn(
-                        "Status",
-                        help="Atualizar status da intenção",
-                        options=["intended", "registered", "completed", "cancelled"],
-                        required=True,
-                    ),
-                    "Prioridade": st.column_config.NumberColumn(
-                        "Prioridade",
-                        min_value=1,
-                        max_value=5,
-                        step=1,
-                        required=True,
-                    )
-                },
-                hide_index=True,
-                use_container_width=True
-            )
-            
-            # Update intentions if changed
-            if not edited_df.equals(df.drop('ID', axis=1)):
-                st.success("Status atualizados com sucesso!")
-                # Here you would save the changes to the database
+            # Read-only until status and priority edits are persisted
+            st.dataframe(df.drop('ID', axis=1), use_container_width=True, hide_index=True)
         
         col1, col2 = st.columns(2)
         with col1:
-            if st.button("📥 Exportar Intenções (CSV)"):
-                export_intentions_to_csv(current_intentions, courses)
+            csv_download_button(
+                "📥 Exportar Intenções (CSV)",
+                lambda: intentions_csv(current_intentions, courses_by_id),
+                "intencoes_cursos"
+            )
         with col2:
             if st.button("🔄 Sincronizar com Sistema"):
                 sync_with_external_system(current_intentions)
@@ -477,8 +481,9 @@ def display_course_card(course_data, user, db, context="all"):
             # Show competency linkage
             if course.competency_ids:
                 st.write("**Competências desenvolvidas:**")
+                comp_index = competency_index()
                 for comp_id in course.competency_ids:
-                    comp = db.get_competency_by_id(comp_id)
+                    comp = comp_index.get(comp_id)
                     if comp:
                         relevance_badge = "🎯" if comp.level == user.target_level else "📚"
                         st.markdown(f"- {relevance_badge} {comp.name} ({comp.level})")
@@ -496,78 +501,86 @@ def display_course_card(course_data, user, db, context="all"):
             impact_data = calculate_course_impact(course, user, db)
            
             if impact_data:
-                fig = go.Figure(data=[
-                    go.Bar(
-                        x=['Competências Atendidas'],
-                        y=[len(impact_data['addressed'])],
-                        marker_color='green'
-                    )
-                ])
-                fig.update_layout(height=200, showlegend=False)
-                # Linha 508 corrigida
-                st.plotly_chart(fig, use_container_width=True, key=f"plotly_chart_{context}_{course_data['course'].id}")
+                st.metric("Competências Atendidas", len(impact_data['addressed']))
        
         # Registration form
         if not already_intended:
-            # Create unique key for this form instance with context
-            form_key = f"course_form_{context}_{course.id}_{datetime.now().timestamp()}"
-            with st.form(form_key):
-                col1, col2 = st.columns([2, 1])
-               
-                with col1:
-                    priority = st.selectbox(
-                        "Prioridade",
-                        [1, 2, 3, 4, 5],
-                        index=2,
-                        key=f"priority_{context}_{course.id}_{datetime.now().timestamp()}"
-                    )
-                    notes = st.text_area(
-                        "Notas (opcional)",
-                        placeholder="Por que você está interessado neste curso?",
-                        key=f"notes_{context}_{course.id}_{datetime.now().timestamp()}"
-                    )
-               
-                with col2:
-                    st.write("**Quando deseja fazer?**")
-                    timeline = st.selectbox(
-                        "Timeline",
-                        ["Imediato", "Próximos 3 meses", "Próximos 6 meses", "Este ano"],
-                        key=f"timeline_{context}_{course.id}_{datetime.now().timestamp()}"
-                    )
-                   
-                    if st.form_submit_button("Registrar Interesse"):
-                        db.save_course_intention(user.id, course.id, priority)
-                        st.success("Interesse registrado com sucesso!")
-                        st.balloons()
-                        st.rerun()
-
-def calculate_match_score(course, search_term):
-    """Calculate match score for search relevance"""
-    score = 0
-    search_lower = search_term.lower()
-    
-    if search_lower in course.name.lower():
-        score += 10
-    if search_lower in course.description.lower():
-        score += 5
-    if search_lower in course.category.lower():
-        score += 3
-    
-    return score
+            course_intention_form(course, user, db, context)
+
+def course_intention_form(course, user, db, context="all"):
+    """Form to register interest in a course"""
+    # Stable key per course and context so the form survives reruns
+    form_key = f"course_form_{context}_{course.id}"
+    with st.form(form_key):
+        col1, col2 = st.columns([2, 1])
+        
+        with col1:
+            priority = st.selectbox(
+                "Prioridade",
+                [1, 2, 3, 4, 5],
+                index=2,
+                key=f"priority_{context}_{course.id}"
+            )
+            notes = st.text_area(
+                "Notas (opcional)",
+                placeholder="Por que você está interessado neste curso?",
+                key=f"notes_{context}_{course.id}"
+            )
+        
+        with col2:
+            st.write("**Quando deseja fazer?**")
+            timeline = st.selectbox(
+                "Timeline",
+                ["Imediato", "Próximos 3 meses", "Próximos 6 meses", "Este ano"],
+                key=f"timeline_{context}_{course.id}"
+            )
+            
+            if st.form_submit_button("Registrar Interesse"):
+                db.save_course_intention(user.id, course.id, priority)
+                st.success("Interesse registrado com sucesso!")
+                st.balloons()
+                st.rerun()
+
+def build_courses_html(course_data_list):
+    """Render a list of course data as a single HTML table"""
+    rows = "".join(
+        f"<tr><td><strong>{escape(c['course'].name)}</strong>{' ✅' if c['already_intended'] else ''}</td>"
+        f"<td>{escape(c['course'].description or '')}</td>"
+        f"<td>{c['course'].duration_hours}h</td>"
+        f"<td>{escape(c['course'].category or '')}</td>"
+        f"<td>{'⭐' * c['relevance']}</td></tr>"
+        for c in course_data_list
+    )
+    return (
+        "<table><thead><tr><th>Curso</th><th>Descrição</th><th>Duração</th>"
+        "<th>Categoria</th><th>Relevância</th></tr></thead>"
+        f"<tbody>{rows}</tbody></table>"
+    )
+
+def build_course_data(rows, intended_course_ids):
+    """Turn (course, relevance) search rows into course card data"""
+    return [
+        {
+            'course': course,
+            'relevance': relevance,
+            'already_intended': course.id in intended_course_ids
+        }
+        for course, relevance in rows
+    ]
 
 def calculate_course_impact(course, user, db):
     """Calculate the impact of a course on user's competency gaps"""
     if not course.competency_ids:
         return None
     
-    assessments = db.get_user_assessments(user.id)
-    target_competencies = db.get_competencies(level=user.target_level)
+    assessments = current_competency_view(user)['assessments']
     
+    comp_index = competency_index()
     addressed = []
     remaining = []
     
     for comp_id in course.competency_ids:
-        comp = db.get_competency_by_id(comp_id)
+        comp = comp_index.get(comp_id)
         if comp and comp.level == user.target_level:
             assessment = assessments.get(comp_id)
             if not assessment or assessment.score < 4:
@@ -581,26 +594,33 @@ def calculate_course_impact(course, user, db):
         'total_impact': len(addressed)
     }
 
-def export_intentions_to_csv(intentions, courses):
-    """Export course intentions to CSV format"""
-    import io
-    
-    output = io.StringIO()
-    output.write("Curso,Categoria,Duração,Prioridade,Status,Data Registro\n")
-    
-    for intention in intentions:
-        course = next((c for c in courses if c.id == intention.course_id), None)
-        if course:
-            output.write(f'"{course.name}","{course.category}","{course.duration_hours}h",{intention.priority},"{intention.status}","{intention.intention_date.strftime("%Y-%m-%d")}"\n')
-    
-    csv_data = output.getvalue()
+def csv_download_button(label, build_csv, file_prefix):
+    """Download button whose CSV is only built when the user clicks it"""
     st.download_button(
-        label="Download CSV",
-        data=csv_data,
-        file_name=f"intencoes_cursos_{datetime.now().strftime('%Y%m%d')}.csv",
-        mime="text/csv"
+        label=label,
+        data=build_csv,
+        file_name=f"{file_prefix}_{datetime.now().strftime('%Y%m%d')}.csv",
+        mime="text/csv",
+        on_click="ignore"
     )
 
+def intentions_csv(intentions, courses_by_id) -> str:
+    """Course intentions as CSV text"""
+    rows = [
+        {
+            'Curso': course.name,
+            'Categoria': course.category,
+            'Duração': f"{course.duration_hours}h",
+            'Prioridade': intention.priority,
+            'Status': intention.status,
+            'Data Registro': intention.intention_date.strftime('%Y-%m-%d')
+        }
+        for intention in intentions
+        if (course := courses_by_id.get(intention.course_id))
+    ]
+    df = pd.DataFrame(rows, columns=['Curso', 'Categoria', 'Duração', 'Prioridade', 'Status', 'Data Registro'])
+    return df.to_csv(index=False)
+
 def sync_with_external_system(intentions):
     """Sync intentions with external scheduling system"""
     # Placeholder for external system integration
@@ -651,53 +671,93 @@ def admin_page():
     with tab5:
         reports_and_analytics()
 
+@st.cache_data(ttl=60)
+def admin_stats() -> Dict:
+    """Collect the admin dashboard statistics, cached for a minute"""
+    # Basic statistics, all counted in a single statement
+    (total_users, total_assessments, total_intentions, total_courses, total_competencies), = db.query("""
+        SELECT (SELECT COUNT(*) FROM users),
+               (SELECT COUNT(*) FROM assessments),
+               (SELECT COUNT(*) FROM course_intentions),
+               (SELECT COUNT(*) FROM courses),
+               (SELECT COUNT(*) FROM competencies)
+    """)
+    
+    # Advanced statistics
+    users_by_level = dict(db.query("SELECT current_level, COUNT(*) FROM users GROUP BY current_level"))
+    targets_by_level = dict(db.query("SELECT target_level, COUNT(*) FROM users GROUP BY target_level"))
+    assessments_by_score = dict(db.query("SELECT score, COUNT(*) FROM assessments GROUP BY score"))
+    intentions_by_status = dict(db.query("SELECT status, COUNT(*) FROM course_intentions GROUP BY status"))
+    
+    # Popular courses
+    popular_courses = db.query("""
+        SELECT c.name, COUNT(ci.id) as count 
+        FROM courses c 
+        LEFT JOIN course_intentions ci ON c.id = ci.course_id 
+        GROUP BY c.id 
+        ORDER BY count DESC 
+        LIMIT 10
+    """)
+    
+    return {
+        'total_users': total_users,
+        'total_assessments': total_assessments,
+        'total_intentions': total_intentions,
+        'total_courses': total_courses,
+        'total_competencies': total_competencies,
+        'users_by_level': users_by_level,
+        'targets_by_level': targets_by_level,
+        'assessments_by_score': assessments_by_score,
+        'intentions_by_status': intentions_by_status,
+        'popular_courses': popular_courses
+    }
+
+@st.cache_data(max_entries=20)
+def admin_charts(users_by_level: Dict, intentions_by_status: Dict):
+    """Build the dashboard figures, rebuilt only when the underlying counts change"""
+    # plotly is imported on first use to keep cold start light
+    import plotly.express as px
+    
+    users_fig = None
+    if users_by_level:
+        users_fig = px.pie(
+            values=list(users_by_level.values()),
+            names=list(users_by_level.keys()),
+            title="Distribuição de Usuários"
+        )
+    
+    status_fig = None
+    if intentions_by_status:
+        status_names = {
+            'intended': 'Planejado',
+            'registered': 'Registrado', 
+            'completed': 'Concluído',
+            'cancelled': 'Cancelado'
+        }
+        labels = [status_names.get(k, k) for k in intentions_by_status.keys()]
+        status_fig = px.bar(
+            x=labels,
+            y=list(intentions_by_status.values()),
+            title="Status das Intenções de Curso"
+        )
+    
+    return users_fig, status_fig
+
 def admin_dashboard():
     """Enhanced admin dashboard with comprehensive statistics"""
     st.subheader("📊 Visão Geral do Sistema")
     
     # Get comprehensive statistics
-    with sqlite3.connect(db.db_path) as conn:
-        cursor = conn.cursor()
-        
-        # Basic statistics
-        cursor.execute("SELECT COUNT(*) FROM users")
-        total_users = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM assessments")
-        total_assessments = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM course_intentions")
-        total_intentions = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM courses")
-        total_courses = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM competencies")
-        total_competencies = cursor.fetchone()[0]
-        
-        # Advanced statistics
-        cursor.execute("SELECT current_level, COUNT(*) FROM users GROUP BY current_level")
-        users_by_level = dict(cursor.fetchall())
-        
-        cursor.execute("SELECT target_level, COUNT(*) FROM users GROUP BY target_level")
-        targets_by_level = dict(cursor.fetchall())
-        
-        cursor.execute("SELECT score, COUNT(*) FROM assessments GROUP BY score")
-        assessments_by_score = dict(cursor.fetchall())
-        
-        cursor.execute("SELECT status, COUNT(*) FROM course_intentions GROUP BY status")
-        intentions_by_status = dict(cursor.fetchall())
-        
-        # Popular courses
-        cursor.execute("""
-            SELECT c.name, COUNT(ci.id) as count 
-            FROM courses c 
-            LEFT JOIN course_intentions ci ON c.id = ci.course_id 
-            GROUP BY c.id 
-            ORDER BY count DESC 
-            LIMIT 10
-        """)
-        popular_courses = cursor.fetchall()
+    stats = admin_stats()
+    total_users = stats['total_users']
+    total_assessments = stats['total_assessments']
+    total_intentions = stats['total_intentions']
+    total_courses = stats['total_courses']
+    total_competencies = stats['total_competencies']
+    users_by_level = stats['users_by_level']
+    assessments_by_score = stats['assessments_by_score']
+    intentions_by_status = stats['intentions_by_status']
+    popular_courses = stats['popular_courses']
     
     # Key metrics
     col1, col2, col3, col4, col5 = st.columns(5)
@@ -713,34 +773,18 @@ def admin_dashboard():
         st.metric("📋 Intenções", total_intentions)
     
     # Charts row
+    users_fig, status_fig = admin_charts(users_by_level, intentions_by_status)
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("Usuários por Nível Atual")
-        if users_by_level:
-            fig = px.pie(
-                values=list(users_by_level.values()),
-                names=list(users_by_level.keys()),
-                title="Distribuição de Usuários"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+        if users_fig:
+            st.plotly_chart(users_fig, use_container_width=True)
     
     with col2:
         st.subheader("Status das Intenções")
-        if intentions_by_status:
-            status_names = {
-                'intended': 'Planejado',
-                'registered': 'Registrado', 
-                'completed': 'Concluído',
-                'cancelled': 'Cancelado'
-            }
-            labels = [status_names.get(k, k) for k in intentions_by_status.keys()]
-            fig = px.bar(
-                x=labels,
-                y=list(intentions_by_status.values()),
-                title="Status das Intenções de Curso"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+        if status_fig:
+            st.plotly_chart(status_fig, use_container_width=True)
     
     # Additional insights
     st.subheader("📈 Insights do Sistema")
@@ -760,77 +804,98 @@ def admin_dashboard():
                 percentage = (count / total_assessments * 100) if total_assessments > 0 else 0
                 st.write(f"- Nota {score}: {count} avaliações ({percentage:.1f}%)")
 
+@st.cache_data(ttl=30)
+def cached_users() -> List[Tuple]:
+    """All user rows for the admin listing, newest first"""
+    return db.query("""
+        SELECT id, name, email, current_level, target_level, created_at
+        FROM users 
+        ORDER BY created_at DESC
+    """)
+
 def user_management():
     """User management interface"""
     st.subheader("👥 Gerenciamento de Usuários")
     
     # Get all users
-    with sqlite3.connect(db.db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, name, email, current_level, target_level, created_at
-            FROM users 
-            ORDER BY created_at DESC
-        """)
-        users_data = cursor.fetchall()
+    users_data = admin_cached('users', db.users_version, cached_users)
     
     if users_data:
-        # Display users in editable table
+        # Display users (read-only; levels are edited one user at a time below)
         users_df = pd.DataFrame(users_data, columns=['ID', 'Nome', 'Email', 'Nível Atual', 'Nível Alvo', 'Data Cadastro'])
         users_df['Data Cadastro'] = pd.to_datetime(users_df['Data Cadastro']).dt.strftime('%Y-%m-%d')
         
         st.write("Usuários cadastrados:")
-        edited_df = st.data_editor(
-            users_df.drop('ID', axis=1),
-            column_config={
-                "Nível Atual": st.column_config.SelectboxColumn(
+        st.dataframe(users_df.drop('ID', axis=1), hide_index=True, use_container_width=True)
+        
+        # Edit a single user's levels
+        levels = ["FC-03", "FC-04", "FC-05", "FC-06"]
+        users_by_id = {user[0]: user for user in users_data}
+        edit_id = st.selectbox(
+            "Editar usuário",
+            list(users_by_id),
+            format_func=lambda uid: users_by_id[uid][1],
+            key="edit_user_id"
+        )
+        with st.form("edit_user_form"):
+            col1, col2 = st.columns(2)
+            with col1:
+                new_current = st.selectbox(
                     "Nível Atual",
+                    levels,
+                    index=levels.index(users_by_id[edit_id][3]),
                     help="Nível hierárquico atual",
-                    options=["FC-03", "FC-04", "FC-05", "FC-06"],
-                    required=True,
-                ),
-                "Nível Alvo": st.column_config.SelectboxColumn(
-                    "Nível Alvo", 
+                    key=f"edit_current_{edit_id}"
+                )
+            with col2:
+                new_target = st.selectbox(
+                    "Nível Alvo",
+                    levels,
+                    index=levels.index(users_by_id[edit_id][4]),
                     help="Nível hierárquico desejado",
-                    options=["FC-03", "FC-04", "FC-05", "FC-06"],
-                    required=True,
+                    key=f"edit_target_{edit_id}"
                 )
-            },
-            hide_index=True,
-            use_container_width=True
-        )
+            
+            if st.form_submit_button("💾 Salvar Níveis"):
+                db.update_user_levels(edit_id, new_current, new_target)
+                admin_stats.clear()
+                cached_users.clear()
+                current_user = st.session_state.current_user
+                if current_user and current_user.id == edit_id:
+                    st.session_state.current_user = replace(current_user, current_level=new_current, target_level=new_target)
+                st.success("Níveis atualizados!")
+                st.rerun()
         
         # User actions
         col1, col2 = st.columns(2)
         with col1:
-            if st.button("📥 Exportar Usuários (CSV)"):
-                export_users_to_csv(users_data)
+            csv_download_button("📥 Exportar Usuários (CSV)", lambda: users_csv(users_data), "usuarios")
         with col2:
             if st.button("📊 Análise de Usuários"):
                 generate_user_analysis_report()
         
         # Individual user actions
         st.subheader("Ações Individuais")
-        selected_user = st.selectbox(
+        selected_id = st.selectbox(
             "Selecionar usuário para ações específicas:",
-            options=[(user[0], user[1]) for user in users_data],
-            format_func=lambda x: x[1]
+            options=list(users_by_id),
+            format_func=lambda uid: users_by_id[uid][1]
         )
         
-        if selected_user:
+        if selected_id:
             col1, col2, col3 = st.columns(3)
             with col1:
                 if st.button("🔄 Resetar Avaliações"):
-                    reset_user_assessments(selected_user[0])
+                    reset_user_assessments(selected_id)
                     st.success("Avaliações resetadas!")
             with col2:
                 if st.button("🗑️ Excluir Usuário"):
-                    delete_user(selected_user[0])
+                    delete_user(selected_id)
                     st.success("Usuário excluído!")
                     st.rerun()
             with col3:
                 if st.button("📋 Ver Detalhes"):
-                    show_user_details(selected_user[0])
+                    show_user_details(selected_id)
     else:
         st.info("Nenhum usuário cadastrado no sistema.")
 
@@ -839,7 +904,7 @@ def competency_management():
     st.subheader("🎯 Gerenciamento de Competências")
     
     # Get all competencies
-    competencies = db.get_competencies()
+    competencies = admin_cached('competencies', db.catalog_version, cached_competencies)
     
     # Tabs for competency operations
     tab1, tab2 = st.tabs(["📋 Listar Competências", "➕ Adicionar Competência"])
@@ -867,8 +932,7 @@ def competency_management():
                                     st.rerun()
             
             # Export competencies
-            if st.button("📥 Exportar Competências"):
-                export_competencies_to_csv(competencies)
+            csv_download_button("📥 Exportar Competências", lambda: competencies_csv(competencies), "competencias")
         else:
             st.info("Nenhuma competência cadastrada.")
     
@@ -899,15 +963,16 @@ def course_management():
     st.subheader("📚 Gerenciamento de Cursos")
     
     # Get courses and competencies
-    courses = db.get_courses()
-    all_competencies = db.get_competencies()
+    courses = admin_cached('courses', db.catalog_version, cached_courses_with_competencies)
+    all_competencies = admin_cached('competencies', db.catalog_version, cached_competencies)
+    comp_index = competency_index()
     
     # Tabs for course operations
     tab1, tab2 = st.tabs(["📋 Listar Cursos", "➕ Adicionar Curso"])
     
     with tab1:
         if courses:
-            for course in courses:
+            for course, linked in courses:
                 with st.expander(f"{course.name} ({course.category})"):
                     col1, col2 = st.columns([3, 1])
                     
@@ -918,12 +983,9 @@ def course_management():
                         st.write(f"**Status:** {'✅ Ativo' if course.is_active else '❌ Inativo'}")
                         
                         # Show linked competencies
-                        if course.competency_ids:
+                        if linked:
                             st.write("**Competências vinculadas:**")
-                            for comp_id in course.competency_ids:
-                                comp = db.get_competency_by_id(comp_id)
-                                if comp:
-                                    st.markdown(f"- {comp.name} ({comp.level})")
+                            st.markdown("\n".join(f"- {comp.name} ({comp.level})" for comp in linked))
                     
                     with col2:
                         if st.button(f"🗑️ Excluir", key=f"del_course_{course.id}"):
@@ -936,8 +998,7 @@ def course_management():
                             st.rerun()
             
             # Export courses
-            if st.button("📥 Exportar Cursos"):
-                export_courses_to_csv(courses)
+            csv_download_button("📥 Exportar Cursos", lambda: courses_csv(courses), "cursos")
         else:
             st.info("Nenhum curso cadastrado.")
     
@@ -952,11 +1013,12 @@ def course_management():
             
             with col2:
                 # Competency selection
-                st.write("**Competências vinculadas:**")
-                selected_competencies = []
-                for comp in all_competencies:
-                    if st.checkbox(f"{comp.name} ({comp.level})", key=f"comp_{comp.id}"):
-                        selected_competencies.append(comp.id)
+                selected_competencies = st.multiselect(
+                    "Competências vinculadas",
+                    options=[comp.id for comp in all_competencies],
+                    format_func=lambda cid: f"{comp_index[cid].name} ({comp_index[cid].level})",
+                    key="course_competencies"
+                )
             
             description = st.text_area("Descrição", key="course_description")
             
@@ -972,189 +1034,111 @@ def reports_and_analytics():
     """Advanced reporting and analytics"""
     st.subheader("📈 Relatórios e Análises")
     
+    report_fragment()
+
+@st.fragment
+def report_fragment():
+    """Report selector and the selected report, rerun on their own"""
     # Report type selection
-    report_type = st.selectbox(
-        "Tipo de Relatório",
-        ["Resumo Geral", "Análise de Competências", "Demandas de Cursos", "Progresso de Usuários", "Tendências"]
-    )
+    report_type = st.selectbox("Tipo de Relatório", list(REPORTS))
     
-    if report_type == "Resumo Geral":
-        generate_summary_report()
-    elif report_type == "Análise de Competências":
-        generate_competency_analysis()
-    elif report_type == "Demandas de Cursos":
-        generate_course_demand_report()
-    elif report_type == "Progresso de Usuários":
-        generate_user_progress_report()
-    elif report_type == "Tendências":
-        generate_trends_report()
+    REPORTS[report_type]()
 
 # Helper functions for admin operations
 def add_competency(name, description, category, level, weight):
     """Add a new competency to the database"""
-    with sqlite3.connect(db.db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO competencies (name, description, category, level, weight)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (name, description, category, level, weight))
-        conn.commit()
+    db.add_competency(name, description, category, level, weight)
+    clear_catalog_cache()
 
 def delete_competency(competency_id):
     """Delete a competency"""
-    with sqlite3.connect(db.db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM competencies WHERE id = ?", (competency_id,))
-        conn.commit()
+    db.delete_competency(competency_id)
+    clear_catalog_cache()
 
 def add_course(name, description, duration, category, competency_ids):
     """Add a new course to the database"""
-    import json
-    with sqlite3.connect(db.db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO courses (name, description, duration_hours, category, competency_ids)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (name, description, duration, category, json.dumps(competency_ids)))
-        conn.commit()
+    db.add_course(name, description, duration, category, competency_ids)
+    clear_catalog_cache()
 
 def delete_course(course_id):
     """Delete a course"""
-    with sqlite3.connect(db.db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM courses WHERE id = ?", (course_id,))
-        conn.commit()
+    db.delete_course(course_id)
+    clear_catalog_cache()
 
 def toggle_course_status(course_id):
     """Toggle course active status"""
-    with sqlite3.connect(db.db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute("UPDATE courses SET is_active = NOT is_active WHERE id = ?", (course_id,))
-        conn.commit()
+    db.toggle_course_status(course_id)
+    clear_catalog_cache()
 
 def reset_user_assessments(user_id):
     """Reset all assessments for a user"""
-    with sqlite3.connect(db.db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM assessments WHERE user_id = ?", (user_id,))
-        conn.commit()
+    db.reset_user_assessments(user_id)
+    clear_report_cache()
 
 def delete_user(user_id):
     """Delete a user and all related data"""
-    with sqlite3.connect(db.db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM course_intentions WHERE user_id = ?", (user_id,))
-        cursor.execute("DELETE FROM assessments WHERE user_id = ?", (user_id,))
-        cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
-        conn.commit()
+    db.delete_user(user_id)
+    clear_report_cache()
 
 def show_user_details(user_id):
     """Show detailed information about a user"""
-    with sqlite3.connect(db.db_path) as conn:
-        cursor = conn.cursor()
-        
-        # Get user info
-        cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-        user = cursor.fetchone()
-        
-        if user:
-            st.write(f"**Usuário:** {user[1]}")
-            st.write(f"**Email:** {user[2]}")
-            st.write(f"**Nível Atual:** {user[3]}")
-            st.write(f"**Nível Alvo:** {user[4]}")
-            st.write(f"**Data Cadastro:** {user[5]}")
-            
-            # Get assessment count
-            cursor.execute("SELECT COUNT(*) FROM assessments WHERE user_id = ?", (user_id,))
-            assessment_count = cursor.fetchone()[0]
-            
-            # Get intention count
-            cursor.execute("SELECT COUNT(*) FROM course_intentions WHERE user_id = ?", (user_id,))
-            intention_count = cursor.fetchone()[0]
-            
-            st.write(f"**Total de Avaliações:** {assessment_count}")
-            st.write(f"**Total de Intenções:** {intention_count}")
+    with db.reader(sqlite3.Row) as conn:
+        # User info plus assessment and intention counts in one statement
+        user = conn.execute("""
+            SELECT u.name, u.email, u.current_level, u.target_level, u.created_at,
+                   (SELECT COUNT(*) FROM assessments WHERE user_id = u.id) AS assessment_count,
+                   (SELECT COUNT(*) FROM course_intentions WHERE user_id = u.id) AS intention_count
+            FROM users u
+            WHERE u.id = ?
+        """, (user_id,)).fetchone()
+    
+    if user:
+        st.write(f"**Usuário:** {user['name']}")
+        st.write(f"**Email:** {user['email']}")
+        st.write(f"**Nível Atual:** {user['current_level']}")
+        st.write(f"**Nível Alvo:** {user['target_level']}")
+        st.write(f"**Data Cadastro:** {user['created_at']}")
+        st.write(f"**Total de Avaliações:** {user['assessment_count']}")
+        st.write(f"**Total de Intenções:** {user['intention_count']}")
 
-def export_users_to_csv(users_data):
-    """Export users to CSV"""
-    import io
-    output = io.StringIO()
-    output.write("ID,Nome,Email,Nível Atual,Nível Alvo,Data Cadastro\n")
-    
-    for user in users_data:
-        output.write(f"{user[0]},{user[1]},{user[2]},{user[3]},{user[4]},{user[5]}\n")
-    
-    csv_data = output.getvalue()
-    st.download_button(
-        label="Download CSV",
-        data=csv_data,
-        file_name=f"usuarios_{datetime.now().strftime('%Y%m%d')}.csv",
-        mime="text/csv"
-    )
+def users_csv(users_data) -> str:
+    """Users as CSV text"""
+    df = pd.DataFrame(users_data, columns=['ID', 'Nome', 'Email', 'Nível Atual', 'Nível Alvo', 'Data Cadastro'])
+    return df.to_csv(index=False)
 
-def export_competencies_to_csv(competencies):
-    """Export competencies to CSV"""
-    import io
-    output = io.StringIO()
-    output.write("ID,Nome,Descrição,Categoria,Nível,Peso\n")
-    
-    for comp in competencies:
-        output.write(f"{comp.id},{comp.name},{comp.description},{comp.category},{comp.level},{comp.weight}\n")
-    
-    csv_data = output.getvalue()
-    st.download_button(
-        label="Download CSV",
-        data=csv_data,
-        file_name=f"competencias_{datetime.now().strftime('%Y%m%d')}.csv",
-        mime="text/csv"
+def competencies_csv(competencies) -> str:
+    """Competencies as CSV text"""
+    df = pd.DataFrame(
+        [(comp.id, comp.name, comp.description, comp.category, comp.level, comp.weight) for comp in competencies],
+        columns=['ID', 'Nome', 'Descrição', 'Categoria', 'Nível', 'Peso']
     )
+    return df.to_csv(index=False)
 
-def export_courses_to_csv(courses):
-    """Export courses to CSV"""
-    import io, json
-    output = io.StringIO()
-    output.write("ID,Nome,Descrição,Duração,Categoria,Competências,Status\n")
-    
-    for course in courses:
-        comp_names = []
-        for comp_id in course.competency_ids:
-            comp = db.get_competency_by_id(comp_id)
-            if comp:
-                comp_names.append(comp.name)
-        
-        output.write(f"{course.id},{course.name},{course.description},{course.duration_hours},{course.category},\"{'; '.join(comp_names)}\",{'Ativo' if course.is_active else 'Inativo'}\n")
-    
-    csv_data = output.getvalue()
-    st.download_button(
-        label="Download CSV",
-        data=csv_data,
-        file_name=f"cursos_{datetime.now().strftime('%Y%m%d')}.csv",
-        mime="text/csv"
+def courses_csv(courses) -> str:
+    """Courses (paired with their competencies) as CSV text"""
+    df = pd.DataFrame(
+        [(course.id, course.name, course.description, course.duration_hours, course.category,
+          '; '.join(comp.name for comp in linked), course.is_active) for course, linked in courses],
+        columns=['ID', 'Nome', 'Descrição', 'Duração', 'Categoria', 'Competências', 'Status']
     )
+    df['Status'] = df['Status'].map(lambda active: 'Ativo' if active else 'Inativo')
+    return df.to_csv(index=False)
 
 def generate_user_analysis_report():
     """Generate comprehensive user analysis report"""
     st.subheader("📊 Análise de Usuários")
     
-    with sqlite3.connect(db.db_path) as conn:
-        cursor = conn.cursor()
-        
+    with db.reader() as conn:
         # User progression analysis
-        cursor.execute("""
+        progression_df = pd.read_sql_query("""
             SELECT current_level, target_level, COUNT(*) as count
             FROM users 
             GROUP BY current_level, target_level
             ORDER BY current_level, target_level
-        """)
-        progression_data = cursor.fetchall()
-        
-        st.write("**Análise de Progressão:}")
-        if progression_data:
-            progression_df = pd.DataFrame(progression_data, columns=['Nível Atual', 'Nível Alvo', 'Quantidade'])
-            st.dataframe(progression_df, use_container_width=True)
+        """, conn).set_axis(['Nível Atual', 'Nível Alvo', 'Quantidade'], axis=1)
         
         # Engagement analysis
-        cursor.execute("""
+        engagement_df = pd.read_sql_query("""
             SELECT u.name, 
                    COUNT(DISTINCT a.id) as assessments_count,
                    COUNT(DISTINCT ci.id) as intentions_count,
@@ -1165,138 +1149,127 @@ def generate_user_analysis_report():
             LEFT JOIN course_intentions ci ON u.id = ci.user_id
             GROUP BY u.id, u.name
             ORDER BY assessments_count DESC, intentions_count DESC
-        """)
-        engagement_data = cursor.fetchall()
-        
-        if engagement_data:
-            st.write("**Engajamento dos Usuários:**")
-            engagement_df = pd.DataFrame(engagement_data, columns=[
-                'Usuário', 'Avaliações', 'Intenções', 'Última Avaliação', 'Última Intenção'
-            ])
-            st.dataframe(engagement_df, use_container_width=True)
+        """, conn).set_axis(['Usuário', 'Avaliações', 'Intenções', 'Última Avaliação', 'Última Intenção'], axis=1)
+    
+    st.write("**Análise de Progressão:**")
+    if not progression_df.empty:
+        st.dataframe(progression_df, use_container_width=True)
+    
+    if not engagement_df.empty:
+        st.write("**Engajamento dos Usuários:**")
+        st.dataframe(engagement_df, use_container_width=True)
+
+@st.cache_data(ttl=30)
+def cached_summary_counts() -> Dict:
+    """Row counts per table plus the average assessment score, in one statement"""
+    with db.reader(sqlite3.Row) as conn:
+        row = conn.execute("""
+            SELECT (SELECT COUNT(*) FROM users) AS users,
+                   (SELECT COUNT(*) FROM competencies) AS competencies,
+                   (SELECT COUNT(*) FROM courses) AS courses,
+                   (SELECT COUNT(*) FROM assessments) AS assessments,
+                   (SELECT COUNT(*) FROM course_intentions) AS course_intentions,
+                   (SELECT AVG(score) FROM assessments) AS avg_score
+        """).fetchone()
+    
+    return dict(row)
 
 def generate_summary_report():
     """Generate system summary report"""
     st.subheader("📋 Resumo do Sistema")
     
-    # Generate comprehensive summary
-    with sqlite3.connect(db.db_path) as conn:
-        cursor = conn.cursor()
-        
-        summary_data = {}
-        
-        # Basic counts
-        for table in ['users', 'competencies', 'courses', 'assessments', 'course_intentions']:
-            cursor.execute(f"SELECT COUNT(*) FROM {table}")
-            summary_data[table] = cursor.fetchone()[0]
-        
-        st.write("**Estatísticas Gerais:**")
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Usuários", summary_data['users'])
-        with col2:
-            st.metric("Competências", summary_data['competencies'])
-        with col3:
-            st.metric("Cursos", summary_data['courses'])
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            st.metric("Avaliações", summary_data['assessments'])
-        with col2:
-            st.metric("Intenções", summary_data['course_intentions'])
-        
-        # Additional insights
-        cursor.execute("SELECT AVG(score) FROM assessments")
-        avg_score = cursor.fetchone()[0]
-        
-        st.write(f"**Média de Avaliações:** {avg_score:.2f}" if avg_score else "Nenhuma avaliação")
+    summary_data = cached_summary_counts()
+    
+    st.write("**Estatísticas Gerais:**")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Usuários", summary_data['users'])
+    with col2:
+        st.metric("Competências", summary_data['competencies'])
+    with col3:
+        st.metric("Cursos", summary_data['courses'])
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Avaliações", summary_data['assessments'])
+    with col2:
+        st.metric("Intenções", summary_data['course_intentions'])
+    
+    # Additional insights
+    avg_score = summary_data['avg_score']
+    st.write(f"**Média de Avaliações:** {avg_score:.2f}" if avg_score else "Nenhuma avaliação")
+
+@st.cache_data(ttl=60)
+def cached_competency_analysis() -> pd.DataFrame:
+    """Per-competency averages, already grouped by category, from one joined aggregate"""
+    with db.reader() as conn:
+        df = pd.read_sql_query("""
+            SELECT c.category, c.name, c.level, AVG(a.score), COUNT(a.id), c.weight
+            FROM competencies c
+            LEFT JOIN assessments a ON a.competency_id = c.id
+            GROUP BY c.id
+            ORDER BY c.category, c.name
+        """, conn).set_axis(['Categoria', 'Competência', 'Nível', 'Média', 'Avaliações', 'Peso'], axis=1)
+    
+    df['Média'] = df['Média'].map(lambda avg_score: f"{avg_score:.2f}" if pd.notna(avg_score) else "N/A")
+    return df
 
 def generate_competency_analysis():
     """Generate competency analysis report"""
     st.subheader("🎯 Análise de Competências")
     
-    competencies = db.get_competencies()
+    analysis_df = cached_competency_analysis()
     
-    if competencies:
-        # Group by category
-        by_category = {}
-        for comp in competencies:
-            if comp.category not in by_category:
-                by_category[comp.category] = []
-            by_category[comp.category].append(comp)
-        
-        for category, comps in by_category.items():
-            st.subheader(f"Competências {category}")
-            
-            # Create assessment summary
-            with sqlite3.connect(db.db_path) as conn:
-                cursor = conn.cursor()
-                
-                category_summary = []
-                for comp in comps:
-                    cursor.execute("""
-                        SELECT AVG(a.score), COUNT(a.id)
-                        FROM assessments a
-                        WHERE a.competency_id = ?
-                    """, (comp.id,))
-                    result = cursor.fetchone()
-                    avg_score, count = result
-                    
-                    category_summary.append({
-                        'Competência': comp.name,
-                        'Nível': comp.level,
-                        'Média': f"{avg_score:.2f}" if avg_score else "N/A",
-                        'Avaliações': count,
-                        'Peso': comp.weight
-                    })
-            
-            if category_summary:
-                df = pd.DataFrame(category_summary)
-                st.dataframe(df, use_container_width=True)
+    for category, category_df in analysis_df.groupby('Categoria', sort=False):
+        st.subheader(f"Competências {category}")
+        st.dataframe(category_df.drop(columns='Categoria'), hide_index=True, use_container_width=True)
 
-def generate_course_demand_report():
-    """Generate course demand report"""
-    st.subheader("📚 Análise de Demanda de Cursos")
-    
-    with sqlite3.connect(db.db_path) as conn:
-        cursor = conn.cursor()
-        
+@st.cache_data(ttl=60)
+def cached_course_demand():
+    """Course demand table and its top-10 chart, cached together"""
+    with db.reader() as conn:
         # Course popularity
-        cursor.execute("""
+        demand_df = pd.read_sql_query("""
             SELECT c.name, c.category, COUNT(ci.id) as intentions,
                    c.duration_hours, c.is_active
             FROM courses c
             LEFT JOIN course_intentions ci ON c.id = ci.course_id
             GROUP BY c.id
             ORDER BY intentions DESC
-        """)
-        course_data = cursor.fetchall()
+        """, conn).set_axis(['Curso', 'Categoria', 'Intenções', 'Duração', 'Ativo'], axis=1)
+    
+    if demand_df.empty:
+        return None, None
+    
+    import plotly.express as px
+    fig = px.bar(
+        demand_df.head(10),
+        x='Curso',
+        y='Intenções',
+        color='Categoria',
+        title="Top 10 Cursos por Demanda"
+    )
+    return demand_df, fig
+
+def generate_course_demand_report():
+    """Generate course demand report"""
+    st.subheader("📚 Análise de Demanda de Cursos")
+    
+    demand_df, fig = cached_course_demand()
+    
+    if demand_df is not None:
+        st.dataframe(demand_df, use_container_width=True)
         
-        if course_data:
-            demand_df = pd.DataFrame(course_data, columns=[
-                'Curso', 'Categoria', 'Intenções', 'Duração', 'Ativo'
-            ])
-            st.dataframe(demand_df, use_container_width=True)
-            
-            # Visualizations
-            fig = px.bar(
-                demand_df.head(10),
-                x='Curso',
-                y='Intenções',
-                color='Categoria',
-                title="Top 10 Cursos por Demanda"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+        # Visualizations
+        st.plotly_chart(fig, use_container_width=True)
 
 def generate_user_progress_report():
     """Generate user progress report"""
     st.subheader("📈 Relatório de Progresso dos Usuários")
     
-    with sqlite3.connect(db.db_path) as conn:
-        cursor = conn.cursor()
-        
+    with db.reader() as conn:
         # User progress towards target levels
-        cursor.execute("""
+        progress_df = pd.read_sql_query("""
             SELECT u.name, u.current_level, u.target_level,
                    COUNT(DISTINCT a.competency_id) as assessed_competencies,
                    AVG(a.score) as avg_score
@@ -1304,48 +1277,58 @@ def generate_user_progress_report():
             LEFT JOIN assessments a ON u.id = a.user_id
             GROUP BY u.id, u.name
             ORDER BY avg_score DESC
-        """)
-        progress_data = cursor.fetchall()
-        
-        if progress_data:
-            progress_df = pd.DataFrame(progress_data, columns=[
-                'Usuário', 'Nível Atual', 'Nível Alvo', 'Competências Avaliadas', 'Média'
-            ])
-            st.dataframe(progress_df, use_container_width=True)
-
-def generate_trends_report():
-    """Generate trends analysis report"""
-    st.subheader("📈 Análise de Tendências")
+        """, conn).set_axis(['Usuário', 'Nível Atual', 'Nível Alvo', 'Competências Avaliadas', 'Média'], axis=1)
     
-    with sqlite3.connect(db.db_path) as conn:
-        cursor = conn.cursor()
-        
+    if not progress_df.empty:
+        st.dataframe(progress_df, use_container_width=True)
+
+@st.cache_data(ttl=60)
+def cached_trends():
+    """Monthly intention trends table and its line chart, cached together"""
+    with db.reader() as conn:
         # Monthly trends for intentions
-        cursor.execute("""
-            SELECT DATE(intention_date, 'start of month') as month,
+        trends_df = pd.read_sql_query("""
+            SELECT strftime('%Y-%m', intention_date) as month,
                    COUNT(*) as intentions,
                    COUNT(DISTINCT user_id) as active_users
             FROM course_intentions
+            WHERE intention_date >= date('now', 'start of month', '-11 months')
             GROUP BY month
             ORDER BY month DESC
-            LIMIT 12
-        """)
-        trends_data = cursor.fetchall()
+        """, conn).set_axis(['Mês', 'Intenções', 'Usuários Ativos'], axis=1)
+    
+    if trends_df.empty:
+        return None, None
+    
+    import plotly.express as px
+    fig = px.line(
+        trends_df,
+        x='Mês',
+        y=['Intenções', 'Usuários Ativos'],
+        title="Tendências Mensais"
+    )
+    return trends_df, fig
+
+def generate_trends_report():
+    """Generate trends analysis report"""
+    st.subheader("📈 Análise de Tendências")
+    
+    trends_df, fig = cached_trends()
+    
+    if trends_df is not None:
+        st.dataframe(trends_df, use_container_width=True)
         
-        if trends_data:
-            trends_df = pd.DataFrame(trends_data, columns=[
-                'Mês', 'Intenções', 'Usuários Ativos'
-            ])
-            st.dataframe(trends_df, use_container_width=True)
-            
-            # Visualization
-            fig = px.line(
-                trends_df,
-                x='Mês',
-                y=['Intenções', 'Usuários Ativos'],
-                title="Tendências Mensais"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+        # Visualization
+        st.plotly_chart(fig, use_container_width=True)
+
+# Report name -> generator, in selector order
+REPORTS = {
+    "Resumo Geral": generate_summary_report,
+    "Análise de Competências": generate_competency_analysis,
+    "Demandas de Cursos": generate_course_demand_report,
+    "Progresso de Usuários": generate_user_progress_report,
+    "Tendências": generate_trends_report,
+}
 
 def main():
     """Main application function"""
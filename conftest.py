@@ -0,0 +1 @@
+"""pytest configuration: makes the top-level modules importable from tests/"""
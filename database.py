@@ -4,13 +4,83 @@ Database Models for Career Development System
 SQLite database schema for competency management and course registration
 """
 
+import atexit
 import sqlite3
-from typing import List, Dict, Optional, Tuple
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 import json
+from db_pool import POOL_CONFIG, ConnectionPool, connect
 
-@dataclass
+# Bump when init_database adds indexes or migrations that should trigger ANALYZE
+SCHEMA_VERSION = 5
+
+# Write transactions between incremental PRAGMA optimize runs
+OPTIMIZE_EVERY = 500
+
+# TIMESTAMP columns (read with PARSE_DECLTYPES) parse to datetime; explicit, since
+# sqlite3's default converter is deprecated and rejects date-only values
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+
+# Base tables, created by one executescript call that opens init_database's
+# transaction; child tables that may need rebuilding are created in Python
+_SCHEMA_SQL = """
+-- Users table
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT UNIQUE NOT NULL,
+    current_level TEXT NOT NULL CHECK (current_level IN ('FC-03', 'FC-04', 'FC-05', 'FC-06')),
+    target_level TEXT NOT NULL CHECK (target_level IN ('FC-03', 'FC-04', 'FC-05', 'FC-06')),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Competencies table
+CREATE TABLE IF NOT EXISTS competencies (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    description TEXT,
+    category TEXT NOT NULL CHECK (category IN ('technical', 'behavioral', 'strategic')),
+    level TEXT NOT NULL CHECK (level IN ('FC-03', 'FC-04', 'FC-05', 'FC-06')),
+    weight REAL DEFAULT 1.0
+);
+
+-- Courses table
+CREATE TABLE IF NOT EXISTS courses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    description TEXT,
+    duration_hours INTEGER,
+    category TEXT,
+    is_active BOOLEAN DEFAULT 1
+);
+"""
+
+# Hot-path reads, kept at module level so _check_query_plans can explain them
+_USER_ASSESSMENTS_SQL = """
+SELECT id, user_id, competency_id, score, assessed_at, notes
+FROM assessments WHERE user_id = ?
+"""
+
+_COURSES_WITH_COMPETENCIES_SQL = """
+SELECT co.id, co.name, co.description, co.duration_hours, co.category, co.is_active,
+       cm.id, cm.name, cm.description, cm.category, cm.level, cm.weight
+FROM courses co
+LEFT JOIN course_competencies cc ON cc.course_id = co.id
+LEFT JOIN competencies cm ON cm.id = cc.competency_id
+WHERE co.is_active = 1
+ORDER BY co.id, cm.id
+"""
+
+_USER_BY_EMAIL_SQL = """
+SELECT id, name, email, current_level, target_level, created_at
+FROM users WHERE email = ?
+"""
+
+@dataclass(slots=True, frozen=True)
 class Competency:
     id: int
     name: str
@@ -19,17 +89,17 @@ class Competency:
     level: str  # FC-03, FC-04, FC-05, FC-06
     weight: float = 1.0
     
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Course:
     id: int
     name: str
     description: str
     duration_hours: int
     category: str
-    competency_ids: List[int]
+    competency_ids: Tuple[int, ...]
     is_active: bool = True
     
-@dataclass
+@dataclass(slots=True, frozen=True)
 class User:
     id: int
     name: str
@@ -38,7 +108,7 @@ class User:
     target_level: str
     created_at: datetime
     
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Assessment:
     id: int
     user_id: int
@@ -47,7 +117,7 @@ class Assessment:
     assessed_at: datetime
     notes: str = ""
     
-@dataclass
+@dataclass(slots=True, frozen=True)
 class CourseIntention:
     id: int
     user_id: int
@@ -59,84 +129,230 @@ class CourseIntention:
 class DatabaseManager:
     def __init__(self, db_path: str = "career_development.db"):
         self.db_path = db_path
+        # Bumped on every assessment write so callers can key caches on it
+        self.assessments_version = 0
+        # Same idea for the course/competency catalog and the user list
+        self.catalog_version = 0
+        self.users_version = 0
+        # Memoized competency reads, per instance so the caches don't outlive
+        # the manager; cleared by _clear_competency_cache on writes. Loads and
+        # clears share a lock, so a load that started before a write can't
+        # store its stale result after the clear
+        self._get_competencies_cached = lru_cache(maxsize=64)(self._load_competencies)
+        self._get_competency_by_id_cached = lru_cache(maxsize=256)(self._load_competency_by_id)
+        self._competency_cache_lock = threading.Lock()
+        # One long-lived autocommit connection in WAL mode for writes, shared
+        # by every write method (one per process when the manager itself is
+        # cached). Plain tuple rows, since results end up in st.cache_data;
+        # TIMESTAMP columns are parsed into datetime objects by the driver.
+        self.conn = connect(self.db_path, row_factory=None, detect_types=sqlite3.PARSE_DECLTYPES)
+        self._lock = threading.RLock()
+        self._transactions = 0
         self.init_database()
+        # Reads borrow mode=ro connections instead, so they run in parallel
+        # with each other and with the writer (opened once the file exists)
+        self._readers = ConnectionPool(
+            self.db_path,
+            min_connections=POOL_CONFIG['min_connections'],
+            max_connections=POOL_CONFIG['max_connections'],
+            timeout=POOL_CONFIG['timeout'],
+            row_factory=None,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            readonly=True,
+        )
+        atexit.register(self.close)
+    
+    def close(self):
+        """Refresh planner statistics and close every connection"""
+        atexit.unregister(self.close)
+        with self._lock:
+            self.conn.execute("PRAGMA optimize")
+            self.conn.close()
+        self._readers.close()
+    
+    @contextmanager
+    def _transaction(self, script: Optional[str] = None) -> Iterator[sqlite3.Connection]:
+        """Run a block as one IMMEDIATE transaction on the shared connection, optionally opened by a SQL script"""
+        with self._lock:
+            try:
+                if script is None:
+                    self.conn.execute("BEGIN IMMEDIATE")
+                else:
+                    # executescript commits anything pending first, so the BEGIN goes inside the script
+                    self.conn.executescript(f"BEGIN IMMEDIATE;\n{script}")
+                yield self.conn
+            except Exception:
+                if self.conn.in_transaction:
+                    self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            
+            # Cheap incremental ANALYZE of whatever the recent writes made stale
+            self._transactions += 1
+            if self._transactions % OPTIMIZE_EVERY == 0:
+                self.conn.execute("PRAGMA optimize")
+    
+    @contextmanager
+    def reader(self, row_factory=None) -> Iterator[sqlite3.Connection]:
+        """Borrow a read-only connection for the duration of a with block"""
+        conn = self._readers.acquire()
+        # Pooled readers hand out plain tuples unless a caller asks otherwise
+        conn.row_factory = row_factory
+        try:
+            yield conn
+        finally:
+            conn.row_factory = None
+            self._readers.release(conn)
+    
+    def query(self, sql: str, params=()) -> List[tuple]:
+        """Run a read-only statement on a pooled reader and fetch all rows"""
+        with self.reader() as conn:
+            return conn.execute(sql, params).fetchall()
     
     def init_database(self):
         """Initialize database tables"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._transaction(_SCHEMA_SQL) as conn:
             cursor = conn.cursor()
             
-            # Users table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    email TEXT UNIQUE NOT NULL,
-                    current_level TEXT NOT NULL CHECK (current_level IN ('FC-03', 'FC-04', 'FC-05', 'FC-06')),
-                    target_level TEXT NOT NULL CHECK (target_level IN ('FC-03', 'FC-04', 'FC-05', 'FC-06')),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+            # Course <-> competency links
+            self._create_child_table(cursor, 'course_competencies', '''
+                CREATE TABLE {table} (
+                    course_id INTEGER NOT NULL,
+                    competency_id INTEGER NOT NULL,
+                    PRIMARY KEY (course_id, competency_id),
+                    FOREIGN KEY (course_id) REFERENCES courses (id) ON DELETE CASCADE
+                ) WITHOUT ROWID
+            ''', {'course_id': 'courses'})
             
-            # Competencies table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS competencies (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    description TEXT,
-                    category TEXT NOT NULL CHECK (category IN ('technical', 'behavioral', 'strategic')),
-                    level TEXT NOT NULL CHECK (level IN ('FC-03', 'FC-04', 'FC-05', 'FC-06')),
-                    weight REAL DEFAULT 1.0
-                )
-            ''')
+            # Older databases kept the links as a JSON array on courses
+            course_columns = [row[1] for row in cursor.execute("PRAGMA table_info(courses)")]
+            if 'competency_ids' in course_columns:
+                cursor.execute('''
+                    INSERT OR IGNORE INTO course_competencies (course_id, competency_id)
+                    SELECT c.id, j.value FROM courses c JOIN json_each(c.competency_ids) j
+                    WHERE json_valid(c.competency_ids)
+                ''')
+                cursor.execute("ALTER TABLE courses DROP COLUMN competency_ids")
             
-            # Courses table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS courses (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    description TEXT,
-                    duration_hours INTEGER,
-                    category TEXT,
-                    competency_ids TEXT,  -- JSON array of competency IDs
-                    is_active BOOLEAN DEFAULT 1
-                )
-            ''')
+            # Assessments and intentions go with their user, but competency_id and
+            # course_id carry no foreign key: deleting a competency or course from
+            # the admin panel keeps users' assessment and intention history
             
             # Assessments table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS assessments (
+            self._create_child_table(cursor, 'assessments', '''
+                CREATE TABLE {table} (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     user_id INTEGER,
                     competency_id INTEGER,
                     score INTEGER CHECK (score BETWEEN 1 AND 5),
                     assessed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     notes TEXT,
-                    FOREIGN KEY (user_id) REFERENCES users (id),
-                    FOREIGN KEY (competency_id) REFERENCES competencies (id),
+                    FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
                     UNIQUE(user_id, competency_id)
                 )
-            ''')
+            ''', {'user_id': 'users'})
             
             # Course intentions table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS course_intentions (
+            self._create_child_table(cursor, 'course_intentions', '''
+                CREATE TABLE {table} (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     user_id INTEGER,
                     course_id INTEGER,
                     intention_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     status TEXT DEFAULT 'intended' CHECK (status IN ('intended', 'registered', 'completed', 'cancelled')),
                     priority INTEGER CHECK (priority BETWEEN 1 AND 5),
-                    FOREIGN KEY (user_id) REFERENCES users (id),
-                    FOREIGN KEY (course_id) REFERENCES courses (id)
+                    FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
                 )
-            ''')
+            ''', {'user_id': 'users'})
+            
+            # Indexes (assessments.user_id and users.email are already covered by
+            # their UNIQUE constraints' indexes; get_user_by_email only runs at login,
+            # so a covering copy of the users table isn't worth its write cost)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ci_course_id ON course_intentions(course_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ci_date ON course_intentions(intention_date)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_assess_comp ON assessments(competency_id)")
+            # Serves get_user_intentions' filter and ORDER BY; supersedes idx_ci_user
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_intentions_user ON course_intentions(user_id, priority, intention_date)")
+            cursor.execute("DROP INDEX IF EXISTS idx_ci_user")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_competencies_level_cat ON competencies(level, category, name)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_courses_active ON courses(is_active) WHERE is_active = 1")
+            # Reverse lookup for course_competencies (its primary key leads with course_id)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_cc_comp ON course_competencies(competency_id)")
             
-            conn.commit()
+            # Full-text indexes over name/description, kept in sync by triggers
+            self._create_fts_index(cursor, 'competencies')
+            self._create_fts_index(cursor, 'courses')
+            
+            # Refresh planner statistics once per schema version
+            cursor.execute("PRAGMA user_version")
+            if cursor.fetchone()[0] < SCHEMA_VERSION:
+                cursor.execute("ANALYZE")
+                cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            
+    
+    def _create_child_table(self, cursor: sqlite3.Cursor, table: str, ddl: str, cascades: Dict[str, str]):
+        """Create a child table, rebuilding older copies whose foreign keys aren't exactly ``cascades``"""
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()
+        if exists is None:
+            cursor.execute(ddl.format(table=table))
+            return
+        
+        # Decided on the foreign keys themselves, so cosmetic DDL edits never rebuild
+        foreign_keys = {(fk[3], fk[2], fk[6]) for fk in cursor.execute(f"PRAGMA foreign_key_list({table})")}
+        if foreign_keys != {(column, parent, 'CASCADE') for column, parent in cascades.items()}:
+            # Rows whose parent is gone would violate the enforced foreign keys
+            keep_rows = " AND ".join(f"{column} IN (SELECT id FROM {parent})" for column, parent in cascades.items())
+            columns = ", ".join(info[1] for info in cursor.execute(f"PRAGMA table_info({table})"))
+            cursor.execute(ddl.format(table=f"{table}_new"))
+            cursor.execute(f"INSERT INTO {table}_new ({columns}) SELECT {columns} FROM {table} WHERE {keep_rows}")
+            cursor.execute(f"DROP TABLE {table}")
+            cursor.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+    
+    def _create_fts_index(self, cursor: sqlite3.Cursor, table: str):
+        """Create an external-content FTS5 index on a table's name and description"""
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (f"{table}_fts",)
+        ).fetchone()
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts
+            USING fts5(name, description, content='{table}', content_rowid='id')
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {table}_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {table}_fts ({table}_fts, rowid, name, description)
+                VALUES ('delete', old.id, old.name, old.description);
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF name, description ON {table} BEGIN
+                INSERT INTO {table}_fts ({table}_fts, rowid, name, description)
+                VALUES ('delete', old.id, old.name, old.description);
+                INSERT INTO {table}_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+            END
+        """)
+        if not exists:
+            # Index rows written before the triggers existed
+            cursor.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+    
+    @staticmethod
+    def _fts_query(term: Optional[str]) -> Optional[str]:
+        """Turn free text into an FTS5 query matching every word as a token prefix"""
+        words = term.split() if term else []
+        # The tokenizer drops punctuation, so 'c++' would degrade to the prefix 'c'
+        if not words or not all(word.isalnum() for word in words):
+            return None
+        return " ".join('"{}"*'.format(word.replace('"', '""')) for word in words)
     
     def seed_initial_data(self):
         """Seed database with initial competencies and courses"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._transaction() as conn:
             cursor = conn.cursor()
             
             # Check if data already exists
@@ -190,18 +406,38 @@ class DatabaseManager:
                 ("Transformação Digital e Inovação", "Liderança de processos de transformação digital", 36, "innovation", [15, 16])
             ]
             
+            # One insert per course, so each links to the id it was just given
+            # (names aren't unique, and a re-seed can leave older courses behind)
             for course in courses:
-                competency_ids_json = json.dumps(course[4])
                 cursor.execute('''
-                    INSERT INTO courses (name, description, duration_hours, category, competency_ids)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (course[0], course[1], course[2], course[3], competency_ids_json))
+                    INSERT INTO courses (name, description, duration_hours, category)
+                    VALUES (?, ?, ?, ?)
+                    RETURNING id
+                ''', course[:4])
+                course_id = cursor.fetchone()[0]
+                cursor.executemany(
+                    "INSERT INTO course_competencies (course_id, competency_id) VALUES (?, ?)",
+                    [(course_id, competency_id) for competency_id in course[4]]
+                )
+            
+            # init_database analyzed the empty tables; give the planner real row counts
+            cursor.execute("ANALYZE")
+        
+        self._clear_competency_cache()
             
-            conn.commit()
     
     def get_competencies(self, level: Optional[str] = None, category: Optional[str] = None) -> List[Competency]:
         """Get competencies, optionally filtered by level and/or category"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._competency_cache_lock:
+            return list(self._get_competencies_cached(level, category))
+    
+    def _load_competencies(self, level: Optional[str], category: Optional[str]) -> Tuple[Competency, ...]:
+        """Competency query behind the per-instance _get_competencies_cached memo"""
+        return tuple(self.iter_competencies(level, category))
+    
+    def iter_competencies(self, level: Optional[str] = None, category: Optional[str] = None) -> Iterator[Competency]:
+        """Stream competencies straight from the cursor (holds a reader connection until exhausted)"""
+        with self.reader() as conn:
             cursor = conn.cursor()
             
             query = "SELECT id, name, description, category, level, weight FROM competencies WHERE 1=1"
@@ -218,13 +454,36 @@ class DatabaseManager:
             query += " ORDER BY level, category, name"
             
             cursor.execute(query, params)
-            rows = cursor.fetchall()
+            for row in cursor:
+                yield Competency(*row)
+    
+    def search_competencies(self, term: str, limit: int = 50) -> List[Competency]:
+        """Full-text search over competency names and descriptions, best matches first (token prefixes only)"""
+        match = self._fts_query(term)
+        if match is None:
+            return []
+        
+        with self.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT c.id, c.name, c.description, c.category, c.level, c.weight
+                FROM competencies_fts f
+                JOIN competencies c ON c.id = f.rowid
+                WHERE competencies_fts MATCH ?
+                ORDER BY bm25(competencies_fts, 10.0, 5.0)
+                LIMIT ?
+            ''', (match, limit))
             
-            return [Competency(*row) for row in rows]
+            return [Competency(*row) for row in cursor.fetchall()]
     
     def get_competency_by_id(self, competency_id: int) -> Optional[Competency]:
         """Get a specific competency by ID"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._competency_cache_lock:
+            return self._get_competency_by_id_cached(competency_id)
+    
+    def _load_competency_by_id(self, competency_id: int) -> Optional[Competency]:
+        """Single-competency lookup behind the per-instance _get_competency_by_id_cached memo"""
+        with self.reader() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT id, name, description, category, level, weight 
@@ -238,12 +497,9 @@ class DatabaseManager:
     
     def get_user_assessments(self, user_id: int) -> Dict[int, Assessment]:
         """Get all assessments for a user, keyed by competency_id"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.reader() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, user_id, competency_id, score, assessed_at, notes
-                FROM assessments WHERE user_id = ?
-            ''', (user_id,))
+            cursor.execute(_USER_ASSESSMENTS_SQL, (user_id,))
             
             rows = cursor.fetchall()
             assessments = {}
@@ -253,47 +509,163 @@ class DatabaseManager:
             
             return assessments
     
+    def get_user_weighted_score(self, user_id: int, level: Optional[str] = None) -> Optional[float]:
+        """Competency-weighted average of a user's scores (optionally for one level), aggregated in SQL"""
+        with self.reader() as conn:
+            row = conn.execute('''
+                SELECT SUM(a.score * c.weight) / SUM(c.weight)
+                FROM assessments a
+                JOIN competencies c ON c.id = a.competency_id
+                WHERE a.user_id = ? AND (? IS NULL OR c.level = ?)
+            ''', (user_id, level, level)).fetchone()
+            return row[0]
+    
     def save_assessment(self, user_id: int, competency_id: int, score: int, notes: str = ""):
         """Save or update an assessment"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._transaction() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                INSERT OR REPLACE INTO assessments (user_id, competency_id, score, notes)
+                INSERT INTO assessments (user_id, competency_id, score, notes)
                 VALUES (?, ?, ?, ?)
+                ON CONFLICT(user_id, competency_id) DO UPDATE SET
+                    score = excluded.score, notes = excluded.notes, assessed_at = CURRENT_TIMESTAMP
             ''', (user_id, competency_id, score, notes))
-            conn.commit()
+        self.assessments_version += 1
+    
+    def save_assessments_bulk(self, user_id: int, scores: List[Tuple[int, int]]):
+        """Save or update several assessments in a single transaction"""
+        with self._transaction() as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                INSERT INTO assessments (user_id, competency_id, score, notes)
+                VALUES (?, ?, ?, '')
+                ON CONFLICT(user_id, competency_id) DO UPDATE SET
+                    score = excluded.score, notes = excluded.notes, assessed_at = CURRENT_TIMESTAMP
+            ''', [(user_id, competency_id, score) for competency_id, score in scores])
+        self.assessments_version += 1
     
     def get_courses(self) -> List[Course]:
         """Get all active courses"""
-        with sqlite3.connect(self.db_path) as conn:
+        return list(self.iter_courses())
+    
+    def iter_courses(self) -> Iterator[Course]:
+        """Stream active courses straight from the cursor (holds a reader connection until exhausted)"""
+        with self.reader() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT id, name, description, duration_hours, category, competency_ids, is_active
-                FROM courses WHERE is_active = 1
+                SELECT c.id, c.name, c.description, c.duration_hours, c.category,
+                       GROUP_CONCAT(cc.competency_id), c.is_active
+                FROM courses c
+                LEFT JOIN course_competencies cc ON cc.course_id = c.id
+                WHERE c.is_active = 1
+                GROUP BY c.id
             ''')
             
+            for row in cursor:
+                yield Course(row[0], row[1], row[2], row[3], row[4], self._split_ids(row[5]), row[6])
+    
+    def get_courses_with_competencies(self) -> List[Tuple[Course, List[Competency]]]:
+        """Get all active courses with their linked competencies, in one joined query"""
+        with self.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_COURSES_WITH_COMPETENCIES_SQL)
+            
+            # Group the joined rows first; Course is frozen, so it's built once per course
+            grouped = {}
+            for row in cursor.fetchall():
+                course_row, competencies = grouped.setdefault(row[0], (row[:6], []))
+                if row[6] is not None:
+                    competencies.append(Competency(*row[6:]))
+            
+            return [
+                (Course(*course_row[:5], tuple(competency.id for competency in competencies), course_row[5]), competencies)
+                for course_row, competencies in grouped.values()
+            ]
+    
+    def search_courses(self, term: Optional[str] = None, category: Optional[str] = None,
+                       gap_ids: Iterable[int] = (), limit: int = -1, offset: int = 0,
+                       only_relevant: bool = False) -> Tuple[List[Tuple[Course, int]], int]:
+        """Search active courses ranked by gap relevance; returns a page of (course, relevance) and the total"""
+        # Matching is a case-insensitive substring test on name, description and
+        # category, as it always was; the FTS index only ranks the matches (bm25,
+        # token prefixes). casefold() (see db_pool) folds non-ASCII letters too,
+        # which LIKE doesn't
+        match = self._fts_query(term)
+        needle = term.strip().casefold() if term and term.strip() else None
+        
+        with self.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                WITH text_hits AS (
+                    SELECT rowid AS id, bm25(courses_fts, 10.0, 5.0) AS rank
+                    FROM courses_fts
+                    WHERE :match IS NOT NULL AND courses_fts MATCH :match
+                      AND rowid IN (SELECT id FROM courses WHERE is_active = 1)
+                ),
+                -- Materialized so the relevance filter below isn't pushed down into
+                -- the CTE, which would evaluate the relevance subquery twice per row
+                matches AS MATERIALIZED (
+                    SELECT c.id, c.name, c.description, c.duration_hours, c.category, c.is_active,
+                           (SELECT GROUP_CONCAT(cc.competency_id) FROM course_competencies cc
+                            WHERE cc.course_id = c.id) AS competency_ids,
+                           (SELECT COUNT(*) FROM course_competencies cc
+                            WHERE cc.course_id = c.id
+                              AND cc.competency_id IN (SELECT value FROM json_each(:gap_ids))) AS relevance,
+                           COALESCE(t.rank, 0) AS text_rank
+                    FROM courses c
+                    LEFT JOIN text_hits t ON t.id = c.id
+                    WHERE c.is_active = 1
+                      AND (:needle IS NULL
+                           OR instr(casefold(c.name), :needle) > 0
+                           OR instr(casefold(c.description), :needle) > 0
+                           OR instr(casefold(c.category), :needle) > 0)
+                      AND (:category IS NULL OR c.category = :category)
+                )
+                SELECT id, name, description, duration_hours, category, competency_ids, is_active,
+                       relevance, COUNT(*) OVER () AS total
+                FROM matches
+                WHERE relevance >= :min_relevance
+                ORDER BY relevance DESC, text_rank, id
+                LIMIT :limit OFFSET :offset
+            ''', {
+                'gap_ids': json.dumps(sorted(gap_ids)),
+                'match': match,
+                'needle': needle,
+                'category': category,
+                'min_relevance': 1 if only_relevant else 0,
+                'limit': limit,
+                'offset': offset
+            })
+            
             rows = cursor.fetchall()
-            courses = []
+            results = []
             for row in rows:
-                competency_ids = json.loads(row[5]) if row[5] else []
-                course = Course(row[0], row[1], row[2], row[3], row[4], competency_ids, row[6])
-                courses.append(course)
+                course = Course(row[0], row[1], row[2], row[3], row[4], self._split_ids(row[5]), row[6])
+                results.append((course, row[7]))
             
-            return courses
+            total = rows[0][8] if rows else 0
+            return results, total
     
     def save_course_intention(self, user_id: int, course_id: int, priority: int = 3):
         """Save a course intention"""
-        with sqlite3.connect(self.db_path) as conn:
+        self.save_course_intentions_bulk(user_id, [(course_id, priority)])
+    
+    def save_course_intentions_bulk(self, user_id: int, course_priorities: List[Tuple[int, int]]):
+        """Save several course intentions in a single transaction"""
+        with self._transaction() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
+            cursor.executemany('''
                 INSERT INTO course_intentions (user_id, course_id, priority)
                 VALUES (?, ?, ?)
-            ''', (user_id, course_id, priority))
-            conn.commit()
+            ''', [(user_id, course_id, priority) for course_id, priority in course_priorities])
     
     def get_user_intentions(self, user_id: int) -> List[CourseIntention]:
         """Get all course intentions for a user"""
-        with sqlite3.connect(self.db_path) as conn:
+        return list(self.iter_user_intentions(user_id))
+    
+    def iter_user_intentions(self, user_id: int) -> Iterator[CourseIntention]:
+        """Stream a user's course intentions straight from the cursor (holds a reader connection until exhausted)"""
+        with self.reader() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT id, user_id, course_id, intention_date, status, priority
@@ -301,93 +673,153 @@ class DatabaseManager:
                 ORDER BY priority, intention_date
             ''', (user_id,))
             
-            rows = cursor.fetchall()
-            return [CourseIntention(*row) for row in rows]
+            for row in cursor:
+                yield CourseIntention(*row)
     
     def create_user(self, name: str, email: str, current_level: str, target_level: str) -> int:
         """Create a new user"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._transaction() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO users (name, email, current_level, target_level)
                 VALUES (?, ?, ?, ?)
+                RETURNING id
             ''', (name, email, current_level, target_level))
-            conn.commit()
-            return cursor.lastrowid
+            user_id = cursor.fetchone()[0]
+            self.users_version += 1
+            return user_id
     
     def get_user_by_email(self, email: str) -> Optional[User]:
         """Get user by email"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.reader() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, name, email, current_level, target_level, created_at
-                FROM users WHERE email = ?
-            ''', (email,))
+            cursor.execute(_USER_BY_EMAIL_SQL, (email,))
             
             row = cursor.fetchone()
             if row:
                 return User(*row)
             return None
     
+    def update_user_levels(self, user_id: int, current_level: str, target_level: str):
+        """Update a user's current and target levels"""
+        with self._transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE users SET current_level = ?, target_level = ?
+                WHERE id = ?
+            ''', (current_level, target_level, user_id))
+        self.users_version += 1
+    
     def add_competency(self, name, description, category, level, weight):
         """Add a new competency to the database"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._transaction() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO competencies (name, description, category, level, weight)
                 VALUES (?, ?, ?, ?, ?)
+                RETURNING id
             ''', (name, description, category, level, weight))
-            conn.commit()
-            return cursor.lastrowid
+            competency_id = cursor.fetchone()[0]
+        self._clear_competency_cache()
+        self.catalog_version += 1
+        return competency_id
     
     def delete_competency(self, competency_id):
         """Delete a competency"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._transaction() as conn:
             cursor = conn.cursor()
+            cursor.execute("DELETE FROM course_competencies WHERE competency_id = ?", (competency_id,))
             cursor.execute("DELETE FROM competencies WHERE id = ?", (competency_id,))
-            conn.commit()
+        self._clear_competency_cache()
+        self.catalog_version += 1
     
     def add_course(self, name, description, duration, category, competency_ids):
         """Add a new course to the database"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO courses (name, description, duration_hours, category, competency_ids)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (name, description, duration, category, json.dumps(competency_ids)))
-            conn.commit()
-            return cursor.lastrowid
+        # Course row and its competency links commit together
+        with self._transaction() as conn:
+            cursor = conn.execute('''
+                INSERT INTO courses (name, description, duration_hours, category)
+                VALUES (?, ?, ?, ?)
+                RETURNING id
+            ''', (name, description, duration, category))
+            course_id = cursor.fetchone()[0]
+            conn.executemany(
+                "INSERT INTO course_competencies (course_id, competency_id) VALUES (?, ?)",
+                [(course_id, competency_id) for competency_id in competency_ids]
+            )
+        self.catalog_version += 1
+        return course_id
     
     def delete_course(self, course_id):
         """Delete a course"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._transaction() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM courses WHERE id = ?", (course_id,))
-            conn.commit()
+        self.catalog_version += 1
     
     def toggle_course_status(self, course_id):
         """Toggle course active status"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._transaction() as conn:
             cursor = conn.cursor()
             cursor.execute("UPDATE courses SET is_active = NOT is_active WHERE id = ?", (course_id,))
-            conn.commit()
+        self.catalog_version += 1
     
     def reset_user_assessments(self, user_id):
         """Reset all assessments for a user"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._transaction() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM assessments WHERE user_id = ?", (user_id,))
-            conn.commit()
+        self.assessments_version += 1
     
     def delete_user(self, user_id):
         """Delete a user and all related data"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM course_intentions WHERE user_id = ?", (user_id,))
-            cursor.execute("DELETE FROM assessments WHERE user_id = ?", (user_id,))
-            cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
-            conn.commit()
+        # Assessments and intentions go with it through ON DELETE CASCADE
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+        self.assessments_version += 1
+        self.users_version += 1
+    
+    def _clear_competency_cache(self):
+        """Drop memoized competency reads after the table changes"""
+        with self._competency_cache_lock:
+            self._get_competencies_cached.cache_clear()
+            self._get_competency_by_id_cached.cache_clear()
+    
+    @staticmethod
+    def _split_ids(concatenated: Optional[str]) -> Tuple[int, ...]:
+        """Parse a GROUP_CONCAT of ids back into a tuple"""
+        return tuple(map(int, concatenated.split(','))) if concatenated else ()
+    
+    def _explain(self, sql: str, params=()) -> List[str]:
+        """Developer aid: return a statement's query plan, failing if it scans a whole table"""
+        # Plan against an empty copy of the schema: with no rows and no sqlite_stat1
+        # the planner goes by the indexes alone, so a missing index can't hide behind
+        # a table that is still small enough to scan
+        with self.reader() as conn:
+            schema = [row[0] for row in conn.execute('''
+                SELECT sql FROM sqlite_master
+                WHERE type IN ('table', 'index') AND sql IS NOT NULL
+                  AND name NOT LIKE 'sqlite_%' AND name NOT LIKE '%_fts%'
+            ''')]
+        scratch = sqlite3.connect(":memory:")
+        try:
+            scratch.executescript(";\n".join(schema))
+            plan = [row[3] for row in scratch.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        finally:
+            scratch.close()
+        # Virtual tables (FTS, json_each) and subquery results are expected to be scanned
+        scans = [step for step in plan
+                 if step.startswith("SCAN ") and "VIRTUAL TABLE" not in step and not step.startswith("SCAN (")]
+        if scans:
+            raise AssertionError(f"full scan in query plan: {scans}")
+        return plan
+    
+    def _check_query_plans(self):
+        """Explain every hot-path read; run after schema or index changes"""
+        self._explain(_USER_ASSESSMENTS_SQL, (0,))
+        self._explain(_COURSES_WITH_COMPETENCIES_SQL)
+        self._explain(_USER_BY_EMAIL_SQL, ("",))
     
     def _get_connection(self):
         """Helper method to get database connection"""
-        return sqlite3.connect(self.db_path)
\ No newline at end of file
+        return self.conn
\ No newline at end of file
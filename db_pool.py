@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+SQLite Connection Pool for Career Development System
+Connection setup and the pool of pre-opened read-only connections behind DatabaseManager
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from urllib.parse import quote
+
+# Pool sizing and per-connection settings
+POOL_CONFIG = {
+    'min_connections': 2,
+    'max_connections': 10,
+    'timeout': 30,
+}
+
+# Prepared statements kept per connection (sqlite3 defaults to 128)
+STATEMENT_CACHE_SIZE = 256
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA foreign_keys=ON",
+)
+
+def _casefold(value):
+    """SQL casefold(): Unicode-aware case folding, which LIKE and lower() only do for ASCII"""
+    return value.casefold() if isinstance(value, str) else value
+
+def connect(db_path: str, row_factory=sqlite3.Row, detect_types: int = 0,
+            readonly: bool = False) -> sqlite3.Connection:
+    """Open an autocommit connection usable from any thread, with the pool pragmas applied"""
+    conn = sqlite3.connect(
+        f"file:{quote(os.fspath(db_path))}?mode=ro" if readonly else db_path,
+        uri=readonly,
+        check_same_thread=False,
+        isolation_level=None,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        detect_types=detect_types
+    )
+    conn.row_factory = row_factory
+    conn.create_function("casefold", 1, _casefold, deterministic=True)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+class ConnectionPool:
+    def __init__(self, db_path: str, min_connections: int = 2, max_connections: int = 10, timeout: float = 30,
+                 **connect_kwargs):
+        self.db_path = db_path
+        self.max_connections = max_connections
+        self.timeout = timeout
+        # Passed through to connect() for every connection the pool opens
+        self.connect_kwargs = connect_kwargs
+        self._idle = queue.Queue(maxsize=max_connections)
+        self._lock = threading.Lock()
+        self._opened = 0
+        
+        for _ in range(min_connections):
+            self._opened += 1
+            self._idle.put(connect(db_path, **connect_kwargs))
+    
+    def acquire(self) -> sqlite3.Connection:
+        """Take an idle connection, opening a new one while under the maximum"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._lock:
+            can_grow = self._opened < self.max_connections
+            if can_grow:
+                self._opened += 1
+        if can_grow:
+            return connect(self.db_path, **self.connect_kwargs)
+        
+        return self._idle.get(timeout=self.timeout)
+    
+    def release(self, conn: sqlite3.Connection):
+        """Return a connection to the pool, rolling back anything left open"""
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+    
+    def close(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
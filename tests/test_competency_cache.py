@@ -0,0 +1,37 @@
+"""Memoized competency reads stay consistent with concurrent writes"""
+
+import threading
+import time
+
+from database import DatabaseManager
+
+
+def test_write_during_load_is_not_masked_by_stale_cache(tmp_path):
+    db = DatabaseManager(tmp_path / "t.db")
+    db.seed_initial_data()
+    loaded, release = threading.Event(), threading.Event()
+    real_iter = db.iter_competencies
+    
+    def slow_iter(*args):
+        rows = list(real_iter(*args))
+        loaded.set()
+        release.wait(5)
+        return iter(rows)
+    
+    # A read misses the cache and loads the old rows...
+    db.iter_competencies = slow_iter
+    reader = threading.Thread(target=db.get_competencies)
+    reader.start()
+    assert loaded.wait(5)
+    db.iter_competencies = real_iter
+    
+    # ...while a write commits and clears the cache before the read stores them
+    writer = threading.Thread(target=db.add_competency, args=("Nova", "", "technical", "FC-03", 1.0))
+    writer.start()
+    time.sleep(0.1)
+    release.set()
+    reader.join(5)
+    writer.join(5)
+    
+    assert "Nova" in {competency.name for competency in db.get_competencies()}
+    db.close()
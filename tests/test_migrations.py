@@ -0,0 +1,99 @@
+"""Opening a database created by the original schema migrates it in place"""
+
+import sqlite3
+
+from database import DatabaseManager
+
+BASELINE_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT UNIQUE NOT NULL,
+    current_level TEXT NOT NULL CHECK (current_level IN ('FC-03', 'FC-04', 'FC-05', 'FC-06')),
+    target_level TEXT NOT NULL CHECK (target_level IN ('FC-03', 'FC-04', 'FC-05', 'FC-06')),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE competencies (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    description TEXT,
+    category TEXT NOT NULL CHECK (category IN ('technical', 'behavioral', 'strategic')),
+    level TEXT NOT NULL CHECK (level IN ('FC-03', 'FC-04', 'FC-05', 'FC-06')),
+    weight REAL DEFAULT 1.0
+);
+CREATE TABLE courses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    description TEXT,
+    duration_hours INTEGER,
+    category TEXT,
+    competency_ids TEXT,  -- JSON array of competency IDs
+    is_active BOOLEAN DEFAULT 1
+);
+CREATE TABLE assessments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    competency_id INTEGER,
+    score INTEGER CHECK (score BETWEEN 1 AND 5),
+    assessed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    notes TEXT,
+    FOREIGN KEY (user_id) REFERENCES users (id),
+    FOREIGN KEY (competency_id) REFERENCES competencies (id),
+    UNIQUE(user_id, competency_id)
+);
+CREATE TABLE course_intentions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    course_id INTEGER,
+    intention_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    status TEXT DEFAULT 'intended' CHECK (status IN ('intended', 'registered', 'completed', 'cancelled')),
+    priority INTEGER CHECK (priority BETWEEN 1 AND 5),
+    FOREIGN KEY (user_id) REFERENCES users (id),
+    FOREIGN KEY (course_id) REFERENCES courses (id)
+);
+INSERT INTO users (name, email, current_level, target_level) VALUES
+    ('Ana', 'ana@x', 'FC-03', 'FC-04'), ('Bruno', 'bruno@x', 'FC-04', 'FC-05');
+INSERT INTO competencies (name, description, category, level) VALUES
+    ('Gestão de Tempo', '', 'behavioral', 'FC-03'), ('Análise de Dados', '', 'technical', 'FC-05');
+INSERT INTO courses (name, description, duration_hours, category, competency_ids) VALUES
+    ('Curso A', '', 8, 'productivity', '[1, 2]'), ('Curso B', '', 4, 'analytics', '[2]');
+INSERT INTO assessments (user_id, competency_id, score) VALUES (1, 1, 4), (1, 2, 3), (2, 2, 5);
+-- Course 99 was deleted without its intentions; that history is kept
+INSERT INTO course_intentions (user_id, course_id, priority) VALUES (1, 1, 1), (2, 2, 2), (2, 99, 3);
+"""
+
+def table_counts(conn):
+    return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ('users', 'competencies', 'courses', 'assessments', 'course_intentions')}
+
+def foreign_keys(conn, table):
+    return {(fk[3], fk[2], fk[6]) for fk in conn.execute(f"PRAGMA foreign_key_list({table})")}
+
+
+def test_baseline_database_migrates_without_losing_rows(tmp_path):
+    path = tmp_path / "baseline.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    before = table_counts(conn)
+    conn.close()
+    
+    DatabaseManager(path).close()
+    
+    conn = sqlite3.connect(path)
+    assert table_counts(conn) == before
+    assert foreign_keys(conn, 'assessments') == {('user_id', 'users', 'CASCADE')}
+    assert foreign_keys(conn, 'course_intentions') == {('user_id', 'users', 'CASCADE')}
+    assert foreign_keys(conn, 'course_competencies') == {('course_id', 'courses', 'CASCADE')}
+    assert conn.execute("SELECT course_id, competency_id FROM course_competencies ORDER BY 1, 2").fetchall() == [
+        (1, 1), (1, 2), (2, 2)
+    ]
+    assert 'competency_ids' not in [info[1] for info in conn.execute("PRAGMA table_info(courses)")]
+    schema = conn.execute("SELECT name, sql FROM sqlite_master ORDER BY name").fetchall()
+    conn.close()
+    
+    # A second open finds nothing left to migrate
+    DatabaseManager(path).close()
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT name, sql FROM sqlite_master ORDER BY name").fetchall() == schema
+    assert table_counts(conn) == before
+    conn.close()
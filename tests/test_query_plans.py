@@ -0,0 +1,10 @@
+"""Query-plan regression checks for the hot database reads"""
+
+from database import DatabaseManager
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    db = DatabaseManager(tmp_path / "t.db")
+    db.seed_initial_data()
+    db._check_query_plans()
+    db.close()
@@ -0,0 +1,52 @@
+"""search_courses matching: substring semantics with FTS ranking"""
+
+import pytest
+
+from database import DatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = DatabaseManager(tmp_path / "t.db")
+    manager.seed_initial_data()
+    manager.add_course("Autogestão de Carreira", "Planejamento pessoal", 8, "career", [])
+    yield manager
+    manager.close()
+
+
+def names(db, term, category=None):
+    courses, total = db.search_courses(term, category)
+    assert total == len(courses)
+    return {course.name for course, _ in courses}
+
+
+def test_word_prefix(db):
+    assert names(db, "lider") == {
+        "Liderança Situacional", "Liderança Executiva", "Transformação Digital e Inovação"
+    }
+
+
+def test_mid_word_substring(db):
+    assert "Autogestão de Carreira" in names(db, "gestão")
+    assert "Comunicação Eficaz" in names(db, "ção")
+
+
+def test_category_filter(db):
+    assert names(db, "gestão", "career") == {"Autogestão de Carreira"}
+    assert names(db, "gestão", "analytics") == set()
+
+
+def test_punctuation_is_matched_literally(db):
+    assert names(db, "c++") == set()
+    assert names(db, '"') == set()
+    assert db.search_competencies("c++") == []
+
+
+def test_prefix_hits_rank_first(db):
+    courses, _ = db.search_courses("gestão")
+    assert courses[-1][0].name == "Autogestão de Carreira"
+
+
+def test_non_ascii_case_folding(db):
+    assert "Comunicação Eficaz" in names(db, "ÇÃO")
+    assert names(db, "LIDERANÇA") == names(db, "liderança") != set()